@@ -0,0 +1,219 @@
+#Agent Server - asyncio API and HTTP / stdio-JSONL server for FullAgent
+
+import argparse
+import asyncio
+import json
+import sys
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from full_agent import FullAgent
+from instrumentation import metrics, profiling
+
+MAX_BODY_BYTES = 1 << 20
+
+class AsyncFullAgent:
+    def __init__(self, agent: FullAgent = None, max_in_flight: int = 64, max_sessions: int = 10000):
+        # One shared agent provides the model, tools and log; each session only adds memory
+        self.agent = agent or FullAgent(max_workers=max_in_flight, flush_interval=1.0)
+        self.max_in_flight = max_in_flight
+        self.max_sessions = max_sessions
+        self.sessions = OrderedDict()
+
+        # The agent is blocking, so queries run on a pool sized to the in-flight limit
+        self.executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="agent-query")
+        self._semaphore = None
+
+    def session(self, session_id: str) -> FullAgent:
+        #Return the agent for a session, evicting the least recently used one when full
+        agent = self.sessions.get(session_id)
+        if agent is None:
+            agent = self.agent.new_session(session_id)
+            self.sessions[session_id] = agent
+            while len(self.sessions) > self.max_sessions:
+                _, evicted = self.sessions.popitem(last=False)
+                evicted.memory.discard()
+        else:
+            self.sessions.move_to_end(session_id)
+        return agent
+
+    async def process_query(self, query: str, session_id: str = "default") -> str:
+        #Process one query for a session, waiting while max_in_flight queries are running
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        async with self._semaphore:
+            agent = self.session(session_id)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, agent.process_query, query)
+
+    def history(self, session_id: str) -> list:
+        agent = self.sessions.get(session_id)
+        return list(agent.conversation_memory) if agent else []
+
+def parse_request(data) -> tuple:
+    #Return (query, session_id) from a decoded request, or raise ValueError if it is malformed
+    if not isinstance(data, dict):
+        raise ValueError("request must be a JSON object")
+    query = data.get("query")
+    if not isinstance(query, str):
+        raise ValueError("'query' must be a string")
+    return query, str(data.get("session", "default"))
+
+async def serve_stdio(server: AsyncFullAgent, stdin=None, stdout=None):
+    #Read {"id", "session", "query"} lines from stdin and write one JSON reply line per request
+    # Replies can arrive out of order, so every reply to an object carries its "id"; at most
+    # max_in_flight lines are read ahead of the replies
+    stdin, stdout = stdin or sys.stdin, stdout or sys.stdout
+    loop = asyncio.get_running_loop()
+    write_lock = asyncio.Lock()
+    slots = asyncio.Semaphore(server.max_in_flight)
+    tasks = set()
+
+    async def handle(line: str):
+        request = None
+        try:
+            request = json.loads(line)
+            query, session_id = parse_request(request)
+            response = await server.process_query(query, session_id)
+            reply = {"id": request.get("id"), "session": session_id, "response": response}
+        except Exception as e:
+            reply = {"id": request.get("id")} if isinstance(request, dict) else {}
+            reply["error"] = str(e)
+        async with write_lock:
+            stdout.write(json.dumps(reply, ensure_ascii=False) + "\n")
+            stdout.flush()
+        slots.release()
+
+    while True:
+        await slots.acquire()
+        line = await loop.run_in_executor(None, stdin.readline)
+        if not line:
+            break
+        if not line.strip():
+            slots.release()
+            continue
+        task = asyncio.ensure_future(handle(line))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    if tasks:
+        await asyncio.gather(*tasks)
+
+async def serve_http(server: AsyncFullAgent, host: str = "127.0.0.1", port: int = 8080,
+                     max_body: int = MAX_BODY_BYTES):
+    #Minimal HTTP/1.1 server: POST /query {"session", "query"}, GET /history?session=..., GET /health, GET /metrics
+    # Bodies over max_body bytes are refused with 413 before they are read
+    async def send(writer, status: str, payload, keep_alive: bool):
+        # dict payloads are sent as JSON, str payloads as plain text (/metrics)
+        if isinstance(payload, str):
+            body, content_type = payload.encode("utf-8"), "text/plain; version=0.0.4"
+        else:
+            body, content_type = json.dumps(payload, ensure_ascii=False).encode("utf-8"), "application/json"
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+            .encode("ascii") + body
+        )
+        await writer.drain()
+
+    async def handle(reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    length = int(headers.get("content-length", 0))
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await send(writer, "400 Bad Request", {"error": "Invalid Content-Length"}, False)
+                    break
+                if length > max_body:
+                    # The body is left unread, so the connection cannot be reused
+                    await send(writer, "413 Payload Too Large",
+                               {"error": f"Request body over {max_body} bytes"}, False)
+                    break
+                body = await reader.readexactly(length)
+                keep_alive = headers.get("connection", "").lower() != "close" and version.strip() == "HTTP/1.1"
+
+                path, _, query_string = target.partition("?")
+                params = dict(p.split("=", 1) for p in query_string.split("&") if "=" in p)
+                if method == "POST" and path == "/query":
+                    try:
+                        query, session_id = parse_request(json.loads(body or b"{}"))
+                        response = await server.process_query(query, session_id)
+                        await send(writer, "200 OK", {"session": session_id, "response": response}, keep_alive)
+                    except ValueError as e:
+                        await send(writer, "400 Bad Request", {"error": f"Invalid request: {str(e)}"}, keep_alive)
+                elif method == "GET" and path == "/history":
+                    session_id = params.get("session", "default")
+                    await send(writer, "200 OK", {"session": session_id, "history": server.history(session_id)}, keep_alive)
+                elif method == "GET" and path == "/health":
+                    await send(writer, "200 OK", {"status": "ok", "sessions": len(server.sessions)}, keep_alive)
+                elif method == "GET" and path == "/metrics":
+                    if params.get("format") == "json":
+                        await send(writer, "200 OK", metrics.to_dict(), keep_alive)
+                    else:
+                        await send(writer, "200 OK", metrics.prometheus_text(), keep_alive)
+                else:
+                    await send(writer, "404 Not Found", {"error": "Not found"}, keep_alive)
+
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    http_server = await asyncio.start_server(handle, host, port)
+    print(f"Agent server listening on http://{host}:{port}", file=sys.stderr)
+    async with http_server:
+        await http_server.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve FullAgent to many concurrent sessions")
+    parser.add_argument("--http", type=int, metavar="PORT", help="serve HTTP on this port")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--stdio", action="store_true", help="serve JSONL requests on stdin/stdout")
+    parser.add_argument("--max-in-flight", type=int, default=64, help="queries processed at once")
+    parser.add_argument("--max-body", type=int, default=MAX_BODY_BYTES, help="largest HTTP request body in bytes")
+    parser.add_argument("--prewarm", action="store_true", help="import the SDK and build models before serving")
+    parser.add_argument("--metrics", action="store_true", help="record spans and token usage (GET /metrics)")
+    parser.add_argument("--metrics-file", help="write metrics here on exit (.json for JSON, else Prometheus text)")
+    parser.add_argument("--profile", choices=["cpu", "memory"], help="profile with cProfile or tracemalloc")
+    parser.add_argument("--profile-output", help="save the raw profile / snapshot to this file")
+    args = parser.parse_args()
+
+    if args.metrics or args.metrics_file:
+        metrics.enabled = True
+
+    try:
+        server = AsyncFullAgent(max_in_flight=args.max_in_flight)
+        if args.prewarm:
+            server.agent.warm()
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    try:
+        with profiling(args.profile, args.profile_output):
+            if args.http:
+                asyncio.run(serve_http(server, args.host, args.http, args.max_body))
+            else:
+                asyncio.run(serve_stdio(server))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if args.metrics_file:
+            metrics.write(args.metrics_file)
+
+if __name__ == "__main__":
+    main()
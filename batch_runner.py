@@ -0,0 +1,221 @@
+#Batch Runner - push a JSONL query corpus through any level with resumable checkpoints
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+def build_handler(level: int, log_path: str = None):
+    #Return (bot, function(query) -> response) for a level; every level logs as its run loop does
+    kwargs = {"log_path": log_path} if log_path else {}
+    if level == 1:
+        from chatbot import SmartChatbot
+        bot = SmartChatbot(**kwargs)
+
+        def handle(query):
+            response = bot.get_response(query)
+            bot.log_interaction(query, response)
+            return response
+    elif level == 2:
+        from chatbot_with_tool import ChatbotWithTool
+        bot = ChatbotWithTool(**kwargs)
+
+        def handle(query):
+            response = bot.process_query(query)
+            bot.log_interaction(query, response, bot.detect_math_query(query))
+            return response
+    else:
+        from full_agent import FullAgent
+        bot = FullAgent(**kwargs)
+        handle = bot.process_query
+    return bot, handle
+
+def read_queries(path: str, start: int = 0):
+    #Yield (line_number, id, query) from a JSONL file, skipping the first start lines
+    # Blank lines are yielded with query None so the checkpoint can move past them;
+    # a line that is not an object or string is yielded as is and recorded as an error
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f):
+            if number < start:
+                continue
+            if not line.strip():
+                yield number, None, None
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = line.strip()
+            if isinstance(record, str):
+                record = {"query": record}
+            elif not isinstance(record, dict):
+                yield number, number, record
+                continue
+            query = record.get("query", record.get("user_input", ""))
+            yield number, record.get("id", number), query
+
+class Checkpoint:
+    def __init__(self, path: str):
+        # Every line below next_line has a result in the output; later results sit in done
+        self.path = path
+        self.next_line = 0
+        self.done = set()
+        self.completed = 0
+        self.errors = 0
+
+    def load(self, output_path: str):
+        #Resume from the checkpoint file and the output written after it
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                self.next_line = json.load(f)["next_line"]
+        if not os.path.exists(output_path):
+            return
+
+        # One streaming pass: recount results, keep those past the watermark and
+        # drop a half-written last line left by a crash
+        with open(output_path, "rb+") as f:
+            offset = 0
+            for line in f:
+                if not line.endswith(b"\n"):
+                    f.truncate(offset)
+                    break
+                offset += len(line)
+                record = json.loads(line)
+                self.completed += 1
+                self.errors += "error" in record
+                if record["line"] >= self.next_line:
+                    self.done.add(record["line"])
+        self.advance()
+
+    def mark(self, number: int, error: bool = False, result: bool = True):
+        self.done.add(number)
+        if result:
+            self.completed += 1
+            self.errors += error
+        self.advance()
+
+    def advance(self):
+        # Keep only out-of-order results in memory; everything contiguous is folded into next_line
+        while self.next_line in self.done:
+            self.done.remove(self.next_line)
+            self.next_line += 1
+
+    def save(self):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"next_line": self.next_line, "completed": self.completed}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+def run_batch(input_path: str, output_path: str, level: int = 3, concurrency: int = 4,
+              log_path: str = None, checkpoint_every: int = 50, report_every: float = 5.0,
+              fresh: bool = False) -> dict:
+    #Process every query in input_path, appending one result line per query to output_path
+    checkpoint = Checkpoint(f"{output_path}.ckpt")
+    if fresh:
+        for path in (output_path, checkpoint.path):
+            if os.path.exists(path):
+                os.remove(path)
+    checkpoint.load(output_path)
+    resumed = checkpoint.completed
+
+    _, handle = build_handler(level, log_path)
+    out = open(output_path, "a", encoding="utf-8")
+
+    def process(number, query_id, query):
+        start = time.perf_counter()
+        record = {"line": number, "id": query_id, "query": query}
+        if not isinstance(query, str):
+            record["error"] = "Expected a JSON object with a string query, or a string"
+            record["latency_ms"] = 0.0
+            return record
+        try:
+            record["response"] = handle(query)
+        except Exception as e:
+            record["error"] = str(e)
+        record["latency_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        return record
+
+    started = last_report = time.perf_counter()
+    since_checkpoint = 0
+    # At most window queries are read ahead, so memory stays flat for any corpus size
+    window = max(1, concurrency) * 2
+    pending = set()
+
+    def collect(futures):
+        nonlocal since_checkpoint, last_report
+        for future in futures:
+            record = future.result()
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            checkpoint.mark(record["line"], "error" in record)
+            since_checkpoint += 1
+        if since_checkpoint >= checkpoint_every:
+            # Results reach disk before the checkpoint that claims them
+            out.flush()
+            os.fsync(out.fileno())
+            checkpoint.save()
+            since_checkpoint = 0
+        now = time.perf_counter()
+        if report_every and now - last_report >= report_every:
+            last_report = now
+            processed = checkpoint.completed - resumed
+            print(f"{checkpoint.completed} done ({checkpoint.errors} errors), "
+                  f"{processed / (now - started):.1f} queries/s", file=sys.stderr)
+
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch") as pool:
+            for number, query_id, query in read_queries(input_path, checkpoint.next_line):
+                if number in checkpoint.done:
+                    continue
+                if query is None:
+                    checkpoint.mark(number, result=False)
+                    continue
+                pending.add(pool.submit(process, number, query_id, query))
+                if len(pending) >= window:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(finished)
+            while pending:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(finished)
+    finally:
+        out.flush()
+        os.fsync(out.fileno())
+        out.close()
+        checkpoint.save()
+
+    elapsed = time.perf_counter() - started
+    processed = checkpoint.completed - resumed
+    return {
+        "completed": checkpoint.completed,
+        "processed": processed,
+        "resumed": resumed,
+        "errors": checkpoint.errors,
+        "seconds": elapsed,
+        "throughput_qps": processed / elapsed if elapsed else 0.0,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a JSONL file of queries through a chatbot level")
+    parser.add_argument("input", help='JSONL with one {"query": ..., "id": ...} object (or string) per line')
+    parser.add_argument("output", help="JSONL results file; re-running resumes where it stopped")
+    parser.add_argument("--level", type=int, choices=[1, 2, 3], default=3)
+    parser.add_argument("--concurrency", type=int, default=4, help="queries processed at once")
+    parser.add_argument("--log-path", help="interaction log for the bot (default: the level's usual log)")
+    parser.add_argument("--checkpoint-every", type=int, default=50, help="results between checkpoints")
+    parser.add_argument("--report-every", type=float, default=5.0, help="seconds between progress lines")
+    parser.add_argument("--fresh", action="store_true", help="discard earlier output and start over")
+    args = parser.parse_args()
+
+    try:
+        summary = run_batch(args.input, args.output, args.level, args.concurrency, args.log_path,
+                            args.checkpoint_every, args.report_every, args.fresh)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(f"{summary['completed']} queries done ({summary['resumed']} from a previous run, "
+          f"{summary['errors']} errors), {summary['throughput_qps']:.1f} queries/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+#Benchmark - replay logged queries through all three levels against the offline stub backend
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import model_registry
+from instrumentation import metrics, profiling
+from response_cache import shared_cache
+from stub_backend import StubModel
+
+# Benchmarks never touch the on-disk translation memory
+os.environ.setdefault("TRANSLATION_MEMORY_PATH", ":memory:")
+from translation_memory import shared_memory
+from semantic_cache import shared_semantic_cache
+
+ENTRY_MODULES = ("chatbot", "chatbot_with_tool", "full_agent", "agent_server")
+
+def import_time_ms(module: str) -> tuple:
+    #Cumulative import time of a module in a fresh interpreter, and whether it pulled in the SDK
+    code = f"import {module}, sys; sys.exit('google.generativeai' in sys.modules)"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    for line in reversed(result.stderr.splitlines()):
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == module:
+            return int(fields[1]) / 1000, result.returncode == 1
+    raise RuntimeError(f"Could not import {module}: {result.stderr.strip()[-200:]}")
+
+def load_corpus(level: int) -> list:
+    #Read the user queries out of a levelN_interactions.txt log
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), f"level{level}_interactions.txt")
+    prefix = "Query: " if level == 3 else "User: "
+    with open(path, encoding="utf-8") as f:
+        return [line[len(prefix):].strip() for line in f if line.startswith(prefix)]
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+class StageTimer:
+    def __init__(self):
+        # Seconds spent per stage, summed across threads
+        self.totals = {}
+        self._lock = threading.Lock()
+
+    def wrap(self, obj, method: str, stage: str):
+        #Replace obj.method with a version that adds its wall time to a stage
+        original = getattr(obj, method)
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    self.totals[stage] = self.totals.get(stage, 0.0) + elapsed
+
+        setattr(obj, method, timed)
+
+def build_level(level: int, log_dir: str, timer: StageTimer):
+    #Construct a level's bot and return (bot, function that handles one query)
+    log_path = os.path.join(log_dir, f"level{level}.jsonl")
+    if level == 1:
+        from chatbot import SmartChatbot
+        bot = SmartChatbot(log_path=log_path)
+        timer.wrap(bot, "log_interaction", "logging")
+
+        def handle(query):
+            bot.log_interaction(query, bot.get_response(query))
+    elif level == 2:
+        from chatbot_with_tool import ChatbotWithTool
+        bot = ChatbotWithTool(log_path=log_path)
+        for method in ("detect_math_query", "has_multiple_task_types"):
+            timer.wrap(bot, method, "routing")
+        timer.wrap(bot.calculator, "calculate", "tools")
+        timer.wrap(bot, "log_interaction", "logging")
+
+        def handle(query):
+            bot.log_interaction(query, bot.process_query(query), bot.detect_math_query(query))
+    else:
+        from full_agent import FullAgent
+        bot = FullAgent(log_path=log_path)
+        timer.wrap(bot, "plan", "routing")
+        timer.wrap(bot.calculator, "calculate", "tools")
+        timer.wrap(bot.translator, "translate", "tools")
+        timer.wrap(bot, "save_interaction", "logging")
+        handle = bot.process_query
+    return bot, handle
+
+def run_level(level: int, queries: list, concurrency: int, latency: float, jitter: float, seed: int) -> dict:
+    stubs = []
+    timer = StageTimer()
+
+    def factory(model_name, **options):
+        # Models are built on their first call, so each stub is timed as it is created
+        stub = StubModel(model_name, latency=latency, jitter=jitter, seed=seed, **options)
+        timer.wrap(stub, "generate_content", "llm")
+        stubs.append(stub)
+        return stub
+
+    model_registry.set_backend(factory)
+    shared_cache.clear()
+    shared_memory().clear()
+    shared_semantic_cache().clear()
+
+    with tempfile.TemporaryDirectory() as log_dir:
+        bot, handle = build_level(level, log_dir, timer)
+
+        def timed_query(query):
+            start = time.perf_counter()
+            handle(query)
+            return time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = list(pool.map(timed_query, queries))
+        wall = time.perf_counter() - start
+        bot.log.close()
+
+    count = len(queries)
+    return {
+        "level": level,
+        "queries": count,
+        "throughput_qps": count / wall if wall else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "llm_calls_per_query": sum(stub.calls for stub in stubs) / count if count else 0.0,
+        "prompt_tokens_per_query": sum(stub.prompt_tokens for stub in stubs) / count if count else 0.0,
+        "cached_tokens_per_query": sum(stub.cached_tokens for stub in stubs) / count if count else 0.0,
+        "cache": shared_cache.stats(),
+        # Stage times are per query; "tools" includes any LLM wait inside the translator
+        "stage_ms_per_query": {stage: total * 1000 / count for stage, total in sorted(timer.totals.items())},
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark for the three chatbot levels")
+    parser.add_argument("--levels", default="1,2,3", help="comma-separated levels to run")
+    parser.add_argument("--repeat", type=int, default=20, help="times to replay each corpus")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.05, help="stub latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.02, help="stub latency jitter in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-cache", action="store_true", help="disable the response and semantic answer caches")
+    parser.add_argument("--json", metavar="PATH", help="also write results as JSON")
+    parser.add_argument("--max-p95-ms", type=float, help="exit 1 if any level's p95 exceeds this")
+    parser.add_argument("--metrics-file", help="write span histograms (.json for JSON, else Prometheus text)")
+    parser.add_argument("--profile", choices=["cpu", "memory"], help="profile the run with cProfile or tracemalloc")
+    parser.add_argument("--import-budget-ms", type=float,
+                        help="check cold import time of each entry module against this budget, then exit")
+    args = parser.parse_args()
+
+    if args.import_budget_ms is not None:
+        over = False
+        for module in ENTRY_MODULES:
+            ms, loads_sdk = import_time_ms(module)
+            failed = ms > args.import_budget_ms or loads_sdk
+            over = over or failed
+            note = " (imports google.generativeai)" if loads_sdk else ""
+            print(f"import {module}: {ms:.1f} ms{note}{'  OVER BUDGET' if failed else ''}")
+        sys.exit(1 if over else 0)
+
+    if args.metrics_file:
+        metrics.enabled = True
+
+    if args.no_cache:
+        shared_cache.max_size = 0
+        os.environ["SEMANTIC_CACHE_SIZE"] = "0"
+
+    results = []
+    for level in (int(x) for x in args.levels.split(",")):
+        queries = load_corpus(level) * args.repeat
+        with profiling(args.profile):
+            result = run_level(level, queries, args.concurrency, args.latency, args.jitter, args.seed)
+        results.append(result)
+
+        print(f"Level {level}: {result['queries']} queries, {result['throughput_qps']:.1f} q/s, "
+              f"p50 {result['p50_ms']:.1f} ms, p95 {result['p95_ms']:.1f} ms, p99 {result['p99_ms']:.1f} ms, "
+              f"{result['llm_calls_per_query']:.2f} LLM calls/query, "
+              f"{result['prompt_tokens_per_query']:.0f} prompt tokens/query "
+              f"({result['cached_tokens_per_query']:.0f} prefix-cached)")
+        stages = ", ".join(f"{stage} {ms:.2f} ms" for stage, ms in result["stage_ms_per_query"].items())
+        print(f"  per query: {stages}")
+
+    if args.metrics_file:
+        metrics.write(args.metrics_file)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.max_p95_ms is not None and any(r["p95_ms"] > args.max_p95_ms for r in results):
+        print(f"p95 latency above {args.max_p95_ms} ms", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
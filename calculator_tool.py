@@ -1,28 +1,240 @@
-#Calculator Tool - Simple math operations
+#Calculator Tool - Safe arithmetic expression engine (Pratt parser)
 
 import re
-from typing import Dict, Any
+from decimal import Decimal, InvalidOperation
+from fractions import Fraction
+from functools import lru_cache
+from typing import Dict, Any, List
+from instrumentation import timed
+
+# Multi-word operators are folded into symbols before tokenizing
+_PHRASES = re.compile(
+    r"\b(multiplied\s+by|divided\s+by|to\s+the\s+power\s+of|raised\s+to|squared|cubed|sum\s+of|product\s+of)\b"
+)
+_PHRASE_SYMBOLS = {
+    "multiplied by": " * ", "divided by": " / ", "to the power of": " ^ ", "raised to": " ^ ",
+    "squared": " ^ 2 ", "cubed": " ^ 3 ", "sum of": " add ", "product of": " multiply ",
+}
+
+_TOKEN = re.compile(r"(?P<num>\d+(?:\.\d+)?|\.\d+)|(?P<word>[a-z]+)|(?P<op>\*\*|[-+*/÷×^%(),])")
+
+_WORD_OPS = {"plus": "+", "minus": "-", "times": "*", "x": "*", "over": "/", "mod": "mod", "modulo": "mod",
+             "percent": "%", "of": "of"}
+_SYMBOL_OPS = {"**": "^", "÷": "/", "×": "*"}
+_VERBS = {"add": "+", "subtract": "-", "multiply": "*", "divide": "/"}
+_SEPARATORS = {"and", "by", "from", "to", "with", ","}
+# Words that can be skipped without changing the arithmetic; any other word ("result",
+# "area", "of" without a percentage) means the text is not a plain expression
+_FILLER = {
+    "what", "whats", "s", "is", "are", "the", "calculate", "compute", "evaluate", "equal", "equals",
+    "please", "tell", "me", "can", "could", "you", "for", "i", "how", "much", "does", "do", "solve",
+    "find", "give", "get", "answer", "value",
+}
+
+# operator -> (binding power, operation name)
+_BINARY = {
+    "+": (10, "addition"), "-": (10, "subtraction"),
+    "*": (20, "multiplication"), "/": (20, "division"), "mod": (20, "modulo"),
+    "of": (20, "percentage"), "^": (30, "exponentiation"),
+}
+_PERCENT_POWER = 40  # postfix: 15% is 0.15, "15% of 200" is 30, "200 + 10%" is 220
+_UNARY_POWER = 25  # -2 ^ 2 == -4, but -2 * 3 == -6
+_MAX_EXPONENT = 1000
+_MAX_BITS = 1 << 14  # exact (fraction) results stop growing at about 5,000 digits
+
+_NUMBER_TYPES = {"float": float, "decimal": Decimal, "fraction": Fraction}
+
+def _tokenize(expression: str) -> list:
+    text = _PHRASES.sub(lambda m: _PHRASE_SYMBOLS[re.sub(r"\s+", " ", m.group(1))], expression.lower())
+    tokens = []
+    for match in _TOKEN.finditer(text):
+        kind, value = match.lastgroup, match.group()
+        if kind == "word":
+            if value in _WORD_OPS:
+                tokens.append(("op", _WORD_OPS[value]))
+            elif value in _VERBS:
+                tokens.append(("verb", value))
+            elif value in _SEPARATORS:
+                tokens.append(("sep", value))
+            elif value not in _FILLER:
+                raise ValueError(f"Unsupported word '{value}'")
+        elif kind == "op":
+            value = _SYMBOL_OPS.get(value, value)
+            tokens.append(("sep", value) if value == "," else ("op", value))
+        else:
+            tokens.append((kind, value))
+
+    # Dangling joiners such as the comma in "Add 10 and 20, then ..." are not operands
+    while tokens and tokens[-1][0] == "sep":
+        tokens.pop()
+    while tokens and tokens[0][0] == "sep":
+        tokens.pop(0)
+    return tokens
+
+class _Parser:
+    def __init__(self, tokens: list):
+        self.tokens = tokens
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def advance(self):
+        token = self.peek()
+        self.pos += 1
+        return token
+
+    def parse(self):
+        node = self.expression()
+        if self.pos < len(self.tokens):
+            raise ValueError(f"Unexpected '{self.peek()[1]}'")
+        return node
+
+    def expression(self, rbp: int = 0):
+        left = self.prefix()
+        while True:
+            kind, value = self.peek()
+            if (kind, value) == ("op", "%"):
+                if _PERCENT_POWER <= rbp:
+                    return left
+                self.advance()
+                left = ("pct", left)
+                continue
+            if kind != "op" or value not in _BINARY or _BINARY[value][0] <= rbp:
+                return left
+            if value == "of" and left[0] != "pct":
+                raise ValueError("Unsupported word 'of'")
+            self.advance()
+            power = _BINARY[value][0]
+            # ^ is right-associative
+            right = self.expression(power - 1 if value == "^" else power)
+            left = ("bin", value, left, right)
+
+    def prefix(self):
+        kind, value = self.advance()
+        if kind == "num":
+            return ("num", value)
+        if kind == "op" and value == "-":
+            return ("neg", self.expression(_UNARY_POWER))
+        if kind == "op" and value == "+":
+            return self.expression(_UNARY_POWER)
+        if kind == "op" and value == "(":
+            node = self.expression()
+            if self.advance() != ("op", ")"):
+                raise ValueError("Missing closing parenthesis")
+            return node
+        if kind == "verb":
+            return self.verb(value)
+        if kind is None:
+            raise ValueError("Incomplete expression")
+        raise ValueError(f"Unexpected '{value}'")
+
+    def verb(self, verb: str):
+        #"add 1, 2 and 3", "subtract 3 from 10", "divide 10 by 2", "multiply 4 and 5"
+        operands = [self.expression()]
+        separators = []
+        while self.peek()[0] == "sep":
+            separators.append(self.advance()[1])
+            operands.append(self.expression())
+        if len(operands) < 2:
+            raise ValueError(f"'{verb}' needs at least two numbers")
+        if verb == "subtract" and separators == ["from"]:
+            operands.reverse()
+
+        node = operands[0]
+        for operand in operands[1:]:
+            node = ("bin", _VERBS[verb], node, operand)
+        return node
+
+@lru_cache(maxsize=1024)
+def parse_expression(expression: str) -> tuple:
+    #Parse an expression once; returns (tree, None) or (None, error) and is cached per string
+    try:
+        return _Parser(_tokenize(expression)).parse(), None
+    except ValueError as e:
+        return None, str(e)
+    except RecursionError:
+        return None, "Expression is nested too deeply"
+
+def _evaluate(tree: tuple, number):
+    #Evaluate bottom-up with an explicit stack, so "1 + 1 + ... + 1" cannot hit the recursion limit
+    values = []
+    stack = [(tree, False)]
+    while stack:
+        node, ready = stack.pop()
+        kind = node[0]
+        if kind == "num":
+            values.append(number(node[1]))
+        elif not ready:
+            stack.append((node, True))
+            children = node[1:] if kind in ("neg", "pct") else node[2:]
+            stack.extend((child, False) for child in reversed(children))
+        elif kind == "neg":
+            values.append(-values.pop())
+        elif kind == "pct":
+            values.append(values.pop() / number(100))
+        else:
+            b = values.pop()
+            a = values.pop()
+            values.append(_apply(node[1], a, b, node[3][0] == "pct"))
+    return values[0]
+
+def _apply(op: str, a, b, percent: bool):
+    if op in ("+", "-") and percent:
+        # "200 + 10%" adds ten percent of 200
+        b = a * b
+    if op == "+":
+        return a + b
+    if op == "-":
+        return a - b
+    if op in ("*", "of"):
+        return a * b
+    if op in ("/", "mod"):
+        if b == 0:
+            raise ZeroDivisionError
+        return a / b if op == "/" else a % b
+    if abs(b) > _MAX_EXPONENT:
+        raise OverflowError("Exponent too large")
+    if isinstance(a, Fraction) and abs(a) not in (0, 1) and \
+            max(a.numerator.bit_length(), a.denominator.bit_length()) * abs(b) > _MAX_BITS:
+        # Fractions never overflow, so nested powers would otherwise grow until memory runs out
+        raise OverflowError("Result too large")
+    return a ** b
 
 class CalculatorTool:
+    def __init__(self, mode: str = "float"):
+        # "float" (default), "decimal" for exact decimal arithmetic or "fraction" for exact ratios
+        if mode not in _NUMBER_TYPES:
+            raise ValueError(f"Unknown calculator mode: {mode}")
+        self.mode = mode
+
+    @timed("tool.calculator")
     def calculate(self, expression: str) -> Dict[str, Any]:
-        expr = expression.lower().strip()
+        tree, error = parse_expression(expression.strip())
+        if tree is None:
+            return {"success": False, "error": f"Could not parse expression: {error}"}
+        if tree[0] == "num":
+            return {"success": False, "error": "Unknown operation"}
+
         try:
-            numbers = [float(x) for x in re.findall(r"-?\d+\.?\d*", expr)]
-            if len(numbers) != 2:
-                return {"success": False, "error": "Could not parse numbers"}
-
-            a, b = numbers
-            if any(op in expr for op in ["add", "+", "plus"]):
-                return {"success": True, "result": a + b, "operation": "addition"}
-            elif any(op in expr for op in ["subtract", "-", "minus"]):
-                return {"success": True, "result": a - b, "operation": "subtraction"}
-            elif any(op in expr for op in ["multiply", "*", "x", "times"]):
-                return {"success": True, "result": a * b, "operation": "multiplication"}
-            elif any(op in expr for op in ["divide", "/", "÷"]):
-                if b == 0:
-                    return {"success": False, "error": "Division by zero"}
-                return {"success": True, "result": a / b, "operation": "division"}
-            else:
-                return {"success": False, "error": "Unknown operation"}
-        except Exception as e:
-            return {"success": False, "error": str(e)}
+            result = _evaluate(tree, _NUMBER_TYPES[self.mode])
+        except ZeroDivisionError:
+            return {"success": False, "error": "Division by zero"}
+        except (OverflowError, InvalidOperation, ValueError) as e:
+            return {"success": False, "error": str(e) or "Result out of range"}
+        except ArithmeticError:
+            # decimal.Overflow and the other decimal signals
+            return {"success": False, "error": "Result out of range"}
+        if isinstance(result, complex):
+            return {"success": False, "error": "Result is not a real number"}
+
+        operation = {"neg": "negation", "pct": "percentage"}.get(tree[0]) or _BINARY[tree[1]][1]
+        return {"success": True, "result": result, "operation": operation}
+
+    def calculate_many(self, expressions: List[str]) -> List[Dict[str, Any]]:
+        #Evaluate many expressions; repeated expressions are computed once
+        results = {}
+        for expression in expressions:
+            if expression not in results:
+                results[expression] = self.calculate(expression)
+        return [dict(results[expression]) for expression in expressions]
@@ -1,15 +1,14 @@
 #Level 1 - EASY: LLM-Only Smart Assistant Using Google Gemini API
 
-import google.generativeai as genai
 import os
 from datetime import datetime
+from interaction_log import InteractionLog
+from llm import generate_text, stream_text, render_stream
+from prompts import PromptTemplate
 
 class SmartChatbot:
-    def __init__(self):
-        # Configure Gemini API key
-        genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
-
-        self.model = genai.GenerativeModel("gemini-2.5-flash")
+    def __init__(self, log_path="level1_interactions.jsonl"):
+        self.log = InteractionLog(log_path)
 
         self.system_prompt = """You are a helpful assistant that ALWAYS follows these rules:
 
@@ -27,25 +26,35 @@ Final Answer: [Your conclusion]
 IMPORTANT: If the user asks for math calculations (addition, multiplication, division, subtraction), 
 you must refuse and say "I cannot perform calculations. Please use a calculator tool for accurate results."
 """
+        # Shared "chat" model carrying the system prompt; each call only sends "User: ..."
+        self.template = PromptTemplate(self.system_prompt)
+        self.model = self.template.model("chat")
 
-    def get_response(self, user_input):
+    def get_response(self, user_input, stream=False):
+        #Return the reply text, or a generator of text chunks when stream=True
+        prompt = self.template.render(input=user_input)
+        if stream:
+            return self.stream_response(prompt)
         try:
-            response = self.model.generate_content(
-                f"{self.system_prompt}\nUser: {user_input}"
-            )
-            return response.text.strip()
+            return generate_text(self.model, prompt)
         except Exception as e:
             return f"Error: {str(e)}"
 
+    def stream_response(self, prompt):
+        try:
+            yield from stream_text(self.model, prompt)
+        except Exception as e:
+            yield f"Error: {str(e)}"
+
     def log_interaction(self, user_input, bot_response):
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        with open("level1_interactions.txt", "a", encoding="utf-8") as f:
-            f.write(f"\n[{timestamp}]\n")
-            f.write(f"User: {user_input}\n")
-            f.write(f"Bot: {bot_response}\n")
-            f.write("-" * 50 + "\n")
+        self.log.append({
+            "timestamp": timestamp,
+            "user_input": user_input,
+            "bot_response": bot_response,
+        })
 
-    def run(self):
+    def run(self, stream=True):
         print("Smart Assistant Level 1 - LLM Only (Gemini API)")
         print("Type 'quit' to exit\n")
         
@@ -57,14 +66,17 @@ you must refuse and say "I cannot perform calculations. Please use a calculator
             if not user_input:
                 continue
                 
-            print("Bot: Thinking...")
-            response = self.get_response(user_input)
-            print(f"Bot: {response}\n")
+            if stream:
+                response = render_stream(self.get_response(user_input, stream=True))
+            else:
+                print("Bot: Thinking...")
+                response = self.get_response(user_input)
+                print(f"Bot: {response}\n")
             
             self.log_interaction(user_input, response)
 
 if __name__ == "__main__":
-    if not os.getenv('GEMINI_API_KEY'):
+    if not os.getenv('GEMINI_API_KEY') and os.getenv('LLM_BACKEND') != 'stub':
         print("Please set GEMINI_API_KEY environment variable")
         print("Example: export GEMINI_API_KEY='your-api-key-here'")
         exit(1)
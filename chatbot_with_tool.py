@@ -1,21 +1,18 @@
 #Level 2 - MEDIUM: LLM + Basic Tool Use (Gemini Version)
 
-import os
-import re
 import json
 from datetime import datetime
-import google.generativeai as genai
+from functools import cached_property
 from calculator_tool import CalculatorTool
+from interaction_log import InteractionLog
+from llm import generate_text, stream_text, render_stream
+from prompts import PromptTemplate
+from query_router import route
 
 class ChatbotWithTool:
-    def __init__(self):
-        # Configure Gemini API
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            raise ValueError("Missing GEMINI_API_KEY")
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel("gemini-2.5-flash")
+    def __init__(self, log_path: str = "level2_interactions.jsonl"):
         self.calculator = CalculatorTool()
+        self.log = InteractionLog(log_path)
         self.system_prompt = (
             """You are a helpful assistant with access to a calculator tool.
             RULES:
@@ -32,28 +29,57 @@ class ChatbotWithTool:
             - For other questions: Use step-by-step reasoning
             """
         )
+        # Shared "chat" model carrying the system prompt; each call only sends "User: ..."
+        self.template = PromptTemplate(self.system_prompt)
+        self.model = self.template.model("chat")
+
+    @cached_property
+    def answers(self):
+        # Semantic answer cache: a rephrased question reuses an earlier answer
+        from semantic_cache import shared_semantic_cache
+        return shared_semantic_cache()
 
     #To detect math query for passing to calculator tool
     def detect_math_query(self, text: str) -> bool:
-        math_patterns = [
-            r"\d+\s*[\+\-\*/xX÷]\s*\d+",
-            r"\b(add|plus|subtract|minus|multiply|times|divide|calculate)\b",
-        ]
-        return any(re.search(p, text.lower()) for p in math_patterns)
+        return route(text).has_math
 
     def has_multiple_task_types(self, query: str) -> bool:
-        return (
-            self.detect_math_query(query)
-            and any(w in query.lower() for w in ["capital", "why", "explain"])
-            and "and" in query.lower()
-        )
+        return route(query).mixed_tasks
+
+    def get_llm_response(self, user_input: str, stream: bool = False):
+        #Return the LLM reply, or a generator of text chunks when stream=True
+        prompt = self.template.render(input=user_input)
+        if stream:
+            return self.stream_response(prompt, user_input)
+        answer = self.answers.lookup("level2", user_input)
+        if answer is not None:
+            return answer
+        try:
+            answer = generate_text(self.model, prompt)
+        except Exception as e:
+            return f"Error: {str(e)}"
+        if answer.strip():
+            self.answers.put("level2", user_input, answer)
+        return answer
 
-    def get_llm_response(self, user_input: str) -> str:
-        response = self.model.generate_content(f"{self.system_prompt}\nUser: {user_input}")
-        return response.text.strip()
+    def stream_response(self, prompt: str, user_input: str = None):
+        answer = self.answers.lookup("level2", user_input) if user_input else None
+        if answer is not None:
+            yield answer
+            return
+        chunks = []
+        try:
+            for chunk in stream_text(self.model, prompt):
+                chunks.append(chunk)
+                yield chunk
+        except Exception as e:
+            yield f"Error: {str(e)}"
+            return
+        if user_input and "".join(chunks).strip():
+            self.answers.put("level2", user_input, "".join(chunks))
     
     #To process the query to use calculator tool
-    def process_query(self, user_input: str) -> str:
+    def process_query(self, user_input: str, stream: bool = False):
         if self.has_multiple_task_types(user_input):
             return "I can only handle one type of task at a time. Please ask a single question."
         if self.detect_math_query(user_input):
@@ -61,7 +87,7 @@ class ChatbotWithTool:
             if result["success"]:
                 return f"I'll use the calculator tool.\nResult: {result['result']}"
             return f"Calculator error: {result['error']}"
-        return self.get_llm_response(user_input)
+        return self.get_llm_response(user_input, stream=stream)
 
     def log_interaction(self, user_input: str, bot_response: str, used_tool: bool = False):
         ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -71,13 +97,9 @@ class ChatbotWithTool:
             "bot_response": bot_response,
             "tool_used": "calculator" if used_tool else None,
         }
-        with open("level2_interactions.txt", "a", encoding="utf-8") as f:
-            f.write(f"\n[{ts}]\n")
-            f.write(f"User: {user_input}\n")
-            f.write(f"Bot: {bot_response}\n")
-            f.write("-" * 50 + "\n")
+        self.log.append(entry)
 
-    def run(self):
+    def run(self, stream: bool = True):
         print("Smart Assistant Level 2 - Gemini Version")
         print("Type 'quit' to exit\n")
         while True:
@@ -86,10 +108,14 @@ class ChatbotWithTool:
                 break
             if not user_input:
                 continue
-            print("Bot: Processing...")
-            response = self.process_query(user_input)
+            if not stream:
+                print("Bot: Processing...")
+            response = self.process_query(user_input, stream=stream)
             used_tool = self.detect_math_query(user_input)
-            print(f"Bot: {response}\n")
+            if isinstance(response, str):
+                print(f"Bot: {response}\n")
+            else:
+                response = render_stream(response)
             self.log_interaction(user_input, response, used_tool)
 
 if __name__ == "__main__":
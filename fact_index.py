@@ -0,0 +1,171 @@
+#Fact Index - offline answers for capital and city-distance questions from local tables
+
+import csv
+import os
+import re
+import threading
+import unicodedata
+from typing import Optional
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_MILE = 1.609344
+_DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# A question is answered only if every word is a known name or one of these; anything else
+# ("population", "before 1990", "why") may change the answer, so it goes to the LLM
+_CAPITAL_WORDS = frozenset("""
+    what is the capital city of tell me us please which name and
+""".split())
+_DISTANCE_WORDS = frozenset("""
+    what is the distance between from to and how far away apart in km kilometers kilometres
+    miles mi tell me us please calculate approximate approximately roughly straight line as crow flies
+    by air great circle it
+""".split())
+
+def fold(text: str) -> list:
+    #Lowercase, accent-free words with possessive 's and punctuation removed
+    text = unicodedata.normalize("NFKD", text.casefold())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    text = re.sub(r"'s\b", "", text)
+    return re.findall(r"[a-z0-9]+", text)
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    #Great-circle distance in km between degree coordinates; arguments broadcast like NumPy arrays
+    lat1, lon1, lat2, lon2 = (np.radians(value) for value in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+class NameTable:
+    def __init__(self):
+        # Folded word tuples -> row; names are matched longest first while scanning a question
+        self.rows = {}
+        self.longest = 1
+
+    def add(self, name: str, row: int):
+        words = tuple(fold(name))
+        if words[:1] == ("the",):
+            # "the" is optional in questions and is matched as a filler word
+            words = words[1:]
+        if words:
+            self.rows.setdefault(words, row)
+            self.longest = max(self.longest, len(words))
+
+    def find(self, words: list) -> tuple:
+        #Return (rows found in order, indexes of the words they used)
+        found, used = [], set()
+        i = 0
+        while i < len(words):
+            for size in range(min(self.longest, len(words) - i), 0, -1):
+                row = self.rows.get(tuple(words[i:i + size]))
+                if row is not None:
+                    found.append(row)
+                    used.update(range(i, i + size))
+                    i += size
+                    break
+            else:
+                i += 1
+        return found, used
+
+class FactIndex:
+    def __init__(self, countries_path: Optional[str] = None, cities_path: Optional[str] = None):
+        # Capitals come from a country table, distances from city coordinates held in NumPy arrays
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self.countries, self.capitals = [], []
+        self._countries = NameTable()
+        with open(countries_path or os.path.join(_DATA_DIR, "countries.csv"), encoding="utf-8", newline="") as f:
+            for row, record in enumerate(csv.DictReader(f)):
+                self.countries.append(record["country"])
+                self.capitals.append(record["capital"])
+                for name in [record["country"], *filter(None, record["aliases"].split("|"))]:
+                    self._countries.add(name, row)
+
+        self.cities = []
+        self._cities = NameTable()
+        coordinates = []
+        with open(cities_path or os.path.join(_DATA_DIR, "cities.csv"), encoding="utf-8", newline="") as f:
+            for row, record in enumerate(csv.DictReader(f)):
+                self.cities.append(record["city"])
+                coordinates.append((float(record["latitude"]), float(record["longitude"])))
+                for name in [record["city"], *filter(None, record["aliases"].split("|"))]:
+                    self._cities.add(name, row)
+        self.latitudes, self.longitudes = np.array(coordinates, dtype=np.float64).reshape(-1, 2).T
+
+    def capital(self, country: str) -> Optional[str]:
+        rows, _ = self._countries.find(fold(country))
+        return self.capitals[rows[0]] if rows else None
+
+    def distance_km(self, origin: str, destination: str) -> Optional[float]:
+        rows, _ = self._cities.find(fold(f"{origin} {destination}"))
+        return self._km(*rows) if len(rows) == 2 else None
+
+    def _km(self, a: int, b: int) -> float:
+        return float(haversine_km(self.latitudes[a], self.longitudes[a], self.latitudes[b], self.longitudes[b]))
+
+    def distances_km(self, origin: str) -> Optional[dict]:
+        #Distance from origin to every indexed city, in one vectorized pass
+        rows, _ = self._cities.find(fold(origin))
+        if not rows:
+            return None
+        row = rows[0]
+        distances = haversine_km(self.latitudes[row], self.longitudes[row], self.latitudes, self.longitudes)
+        return dict(zip(self.cities, distances.tolist()))
+
+    def answer(self, question: str, peek: bool = False) -> Optional[str]:
+        #Answer a capital or distance question from the tables, or None to fall through to the LLM
+        # peek=True answers without counting a hit or miss
+        words = fold(question)
+        result = None
+        if "capital" in words:
+            result = self._answer_capital(words)
+        elif "distance" in words or "far" in words:
+            result = self._answer_distance(words)
+        if peek:
+            return result
+        with self._lock:
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return result
+
+    def _answer_capital(self, words: list) -> Optional[str]:
+        rows, used = self._countries.find(words)
+        if not rows or any(word not in _CAPITAL_WORDS for i, word in enumerate(words) if i not in used):
+            return None
+        return " ".join(f"The capital of {self.countries[row]} is {self.capitals[row].rstrip('.')}."
+                        for row in dict.fromkeys(rows))
+
+    def _answer_distance(self, words: list) -> Optional[str]:
+        rows, used = self._cities.find(words)
+        if len(rows) != 2 or rows[0] == rows[1]:
+            return None
+        if any(word not in _DISTANCE_WORDS for i, word in enumerate(words) if i not in used):
+            return None
+        km = self._km(*rows)
+        miles = km / KM_PER_MILE
+        amounts = f"{miles:,.0f} miles ({km:,.0f} km)" if "miles" in words or "mi" in words \
+            else f"{km:,.0f} km ({miles:,.0f} miles)"
+        return (f"The distance between {self.cities[rows[0]]} and {self.cities[rows[1]]} "
+                f"is about {amounts} in a straight line.")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "countries": len(self.countries), "cities": len(self.cities)}
+
+_shared = None
+_shared_lock = threading.Lock()
+
+def shared_fact_index() -> FactIndex:
+    #Process-wide index, loaded on first use from FACT_COUNTRIES_PATH / FACT_CITIES_PATH
+    global _shared
+    if _shared is None:
+        with _shared_lock:
+            if _shared is None:
+                _shared = FactIndex(os.getenv("FACT_COUNTRIES_PATH"), os.getenv("FACT_CITIES_PATH"))
+    return _shared
@@ -1,26 +1,24 @@
 #Level 3 - HARD: Full Agentic AI with Multi-Step Tasks
 
-import os
 import re
-from datetime import datetime
-import google.generativeai as genai
-from calculator_tool import CalculatorTool
-from translator_tool import TranslatorTool
+import json
+import copy
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property
+from interaction_log import InteractionLog
+from interaction_store import InteractionStore
+from model_registry import get_model
+from llm import generate_text, stream_text, render_stream, cached_text, remember, model_name_of
+from prompts import PromptTemplate
+from query_router import QueryPlan, route, classify_step, step_tier
+from hedging import Hedger
+from instrumentation import metrics, timed
 
 class FullAgent:
-    def __init__(self):
-        # Setup Gemini API
-        api_key = os.getenv('GEMINI_API_KEY')
-        if not api_key:
-            raise ValueError("Missing GEMINI_API_KEY environment variable")
-        
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel("gemini-2.0-flash-exp")
-        
-        # Initialize tools
-        self.calculator = CalculatorTool()
-        self.translator = TranslatorTool()
-        self.conversation_memory = []
+    def __init__(self, max_workers: int = 4, log_path: str = "level3_interactions.jsonl",
+                 flush_interval: float = None, resume_history: bool = False, memory_size: int = 50,
+                 tiered: bool = True, hedge_percentile: float = 95.0):
         self.system_prompt = ("""You are an advanced AI agent that can break down complex tasks into steps and use tools.
             AVAILABLE TOOLS:
             1. Calculator: For math operations (add, subtract, multiply, divide)
@@ -52,95 +50,285 @@ class FullAgent:
             - For general knowledge: Use your knowledge
             - Always be precise and show your reasoning
             """)
+
+        # Shared Gemini models from the process-wide registry; the system prompt is sent
+        # once as their system instruction rather than with every step prompt
+        self.template = PromptTemplate(self.system_prompt)
+        self.model = self.template.model("router")
+        self.knowledge_model = self.template.model("knowledge")
+        # Short, simple knowledge steps go to the fast tier; the knowledge model is the strong tier
+        self.tiers = {"fast": self.template.model("fast"), "strong": self.knowledge_model} if tiered else None
+        # A primary that outlives its p95 latency is raced against a fallback (None disables)
+        self.hedger = Hedger(percentile=hedge_percentile) if hedge_percentile else None
+
+        # Tools are built on first use (see the calculator / translator properties)
+        self.session_id = None
+
+        # Append-only log; a background flusher keeps disk off the reply path
+        self.log = InteractionLog(log_path, flush_interval=flush_interval)
+        # Bounded memory: recent turns in RAM, older ones paged in through an offset index
+        self.memory = InteractionStore(self.log, index_path=f"{log_path}.idx", ring_size=memory_size)
+        if resume_history:
+            self.load_history()
+
+        # Steps with no data dependency run concurrently on a bounded pool
+        self.max_workers = max_workers
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="agent-step")
+
+    @cached_property
+    def calculator(self):
+        from calculator_tool import CalculatorTool
+        return CalculatorTool()
+
+    @cached_property
+    def translator(self):
+        from translator_tool import TranslatorTool
+        return TranslatorTool()
+
+    @cached_property
+    def facts(self):
+        # Local capital / city-distance tables, consulted before any LLM call
+        from fact_index import shared_fact_index
+        return shared_fact_index()
+
+    @cached_property
+    def answers(self):
+        # Semantic answer cache: a rephrased knowledge question reuses an earlier answer
+        from semantic_cache import shared_semantic_cache
+        return shared_semantic_cache()
+
+    def warm(self):
+        #Build tools and models now instead of on the first query (server pre-warm)
+        # Sessions created afterwards share the built tools
+        for tool in ("calculator", "translator", "facts"):
+            getattr(self, tool)
+        plain = [self.plain_model(role) for role in ("router", "knowledge", "fast")]
+        for model in (self.model, self.knowledge_model, self.translator.model, *(self.tiers or {}).values(), *plain):
+            model.resolve()
+
+    def plain_model(self, role: str):
+        #Model without the agent's system prompt, for prompts whose output is parsed
+        # ("only the numeric result", "only the German translation", JSON-only fused calls)
+        return get_model(role)
+
+    @timed("routing")
+    def plan(self, query: str) -> QueryPlan:
+        #Route the query once into a typed step plan
+        return route(query)
+
     def is_multi_step(self, query: str) -> bool:
         #Check if query needs multiple steps
-        query_lower = query.lower()
-
-        if any(indicator in query_lower for indicator in ['and then', 'then ']):
-            return True
-        
-        # Multiple math operations
-        math_count = len(re.findall(r'\b(add|multiply|subtract|divide)\s+\d+\s+and\s+\d+', query_lower))
-        if math_count > 1:
-            return True
-        
-        # Different tool types needed
-        has_translate = 'translate' in query_lower and 'german' in query_lower
-        has_math = bool(re.search(r'\b(add|multiply|subtract|divide)\s+\d+\s+and\s+\d+', query_lower))
-        has_knowledge = any(word in query_lower for word in ['capital', 'distance', 'tell me'])
-        
-        tools_needed = sum([has_translate, has_math, has_knowledge])
-        return tools_needed > 1
+        return self.plan(query).multi_step
 
     def split_query(self, query: str) -> list:
         #Split multi-step query into individual steps
-        if "and then" in query.lower():
-            return [part.strip() for part in re.split(r'\s+and\s+then\s+', query, flags=re.IGNORECASE)]
-        elif "then " in query.lower():
-            return [part.strip() for part in re.split(r'\s+then\s+', query, flags=re.IGNORECASE)]
-
-        math_matches = list(re.finditer(r'\b(add|multiply|subtract|divide)\s+\d+\s+and\s+\d+', query, re.IGNORECASE))
-        if len(math_matches) > 1:
-            math_expressions = [match.group(0) for match in math_matches]
-            return math_expressions
-        
-        # Mixed operations - separating translate and math,knowledge
-        if 'translate' in query.lower():
-            translate_match = re.search(r"translate\s+['\"][^'\"]*['\"].*?german", query, re.IGNORECASE)
-            if translate_match:
-                translate_part = translate_match.group(0)
-                remaining = query.replace(translate_part, "").strip()
-                remaining = re.sub(r'^(and\s+then\s+|,\s*|and\s+)', '', remaining, flags=re.IGNORECASE).strip()
-                if remaining:
-                    if query.find(translate_part) < query.find(remaining):
-                        return [translate_part, remaining]
-                    else:
-                        return [remaining, translate_part]
-        
-        return [query]
+        return [step.text for step in self.plan(query).parts]
+
+    def model_for(self, step):
+        #Knowledge model for a step's tier (the knowledge model when tiering is off)
+        if self.tiers is None:
+            return self.knowledge_model
+        return self.tiers[step_tier(step)]
 
-    def process_step(self, step: str) -> str:
+    def hedge(self, key: str, primary, fallback):
+        #Run primary, falling back on failure; with hedging on, a slow primary races the fallback
+        if self.hedger is not None:
+            return self.hedger.run(key, primary, fallback)
+        result = primary()
+        return result if result is not None else fallback()
+
+    def process_step(self, step, stream: bool = False):
         #Process a single step and return result with comprehensive fallback
-        step_lower = step.lower()
-        
-        if 'translate' in step_lower and 'german' in step_lower:
-            quote_match = re.search(r"['\"]([^'\"]+)['\"]", step)
-            if quote_match:
-                text = quote_match.group(1)
+        # step is a routed Step or a plain string; with stream=True the knowledge path
+        # returns a generator of text chunks
+        if isinstance(step, str):
+            step = classify_step(step)
+
+        if step.tool == "translate":
+            if step.argument:
+                text = step.argument
                 try:
-                    result = self.translator.translate(text)
-                    if result["success"]:
+                    result = self.translator.from_memory(text)
+                    if result is not None:
                         return f"Translated '{text}' to German: '{result['translation']}'"
-                    else:
+
+                    def translate():
+                        result = self.translator.translate(text, use_memory=False)
+                        return result["translation"] if result["success"] else None
+
+                    def fallback():
                         # Fallback: Use Gemini for translation
-                        fallback_result = self.model.generate_content(f"Translate '{text}' to German. Give only the German translation:")
-                        return f"Translated '{text}' to German: '{fallback_result.text.strip()}'"
+                        fallback_text = generate_text(self.plain_model("router"), f"Translate '{text}' to German. Give only the German translation:")
+                        self.translator.remember(text, fallback_text)
+                        return fallback_text
+
+                    return f"Translated '{text}' to German: '{self.hedge('translate', translate, fallback)}'"
                 except Exception as e:
                     return f"Translation unavailable for '{text}' (Error: {str(e)})"
             else:
                 return "Could not extract text to translate from your request"
         
         # Math operations with fallback
-        if re.search(r'\b(add|multiply|subtract|divide)\s+\d+\s+and\s+\d+', step_lower):
+        if step.tool == "calculate":
             try:
-                result = self.calculator.calculate(step)
+                result = self.calculator.calculate(step.argument)
                 if result["success"]:
                     return f"Calculated {result['operation']}: {result['result']}"
                 else:
-                    fallback_result = self.model.generate_content(f"Calculate: {step}. Give only the numeric result:")
-                    return f"Calculated result: {fallback_result.text.strip()}"
+                    fallback_text = generate_text(self.plain_model("router"), f"Calculate: {step.text}. Give only the numeric result:")
+                    return f"Calculated result: {fallback_text}"
             except Exception as e:
                 return f"Calculation unavailable (Error: {str(e)})"
         
         # Knowledge questions with fallback
+        if stream:
+            return self.stream_knowledge(step.text)
+        try:
+            answer = self.facts.answer(step.text) or self.answers.lookup("knowledge", step.text)
+            if answer is not None:
+                return f"Knowledge query: {answer}"
+            model = self.model_for(step)
+            prompt = self.knowledge_prompt(step.text)
+            # The hedge goes to a different model: identical calls on one model are coalesced
+            if self.tiers is None:
+                backup = self.model
+            else:
+                backup = self.tiers["strong" if model is self.tiers["fast"] else "fast"]
+            if model_name_of(backup) == model_name_of(model):
+                # Same model and prompt (e.g. tiered=False): a "hedge" would only join the in-flight call
+                answer = generate_text(model, prompt)
+            else:
+                answer = self.hedge(f"knowledge.{model_name_of(model)}",
+                                    lambda: generate_text(model, prompt), lambda: generate_text(backup, prompt))
+            if answer.strip():
+                self.answers.put("knowledge", step.text, answer)
+            return f"Knowledge query: {answer}"
+        except Exception as e:
+            return self.knowledge_error(step.text, e)
+
+    def knowledge_prompt(self, question: str) -> str:
+        return f"Answer this question concisely: {question}"
+
+    def knowledge_error(self, step: str, error: Exception) -> str:
+        if any(word in step.lower() for word in ['capital', 'distance']):
+            return f"Knowledge query unavailable (Error: {str(error)}). Please check your internet connection."
+        else:
+            return f"I cannot process this request right now (Error: {str(error)})"
+
+    def stream_knowledge(self, step: str):
+        #Yield a knowledge step result in chunks; joined, they equal process_step's result
+        answer = self.facts.answer(step) or self.answers.lookup("knowledge", step)
+        if answer is not None:
+            yield f"Knowledge query: {answer}"
+            return
+        started = False
+        chunks = []
+        try:
+            for chunk in stream_text(self.model_for(classify_step(step)), self.knowledge_prompt(step)):
+                if not started:
+                    started = True
+                    yield "Knowledge query: "
+                chunks.append(chunk)
+                yield chunk
+            if "".join(chunks).strip():
+                self.answers.put("knowledge", step, "".join(chunks))
+        except Exception as e:
+            if started:
+                yield f"\n(Answer interrupted: {str(e)})"
+            else:
+                yield self.knowledge_error(step, e)
+
+    def run_step(self, i: int, step) -> str:
+        #Run one step, turning any failure into the per-step fallback message
         try:
-            response = self.model.generate_content(f"Answer this question concisely: {step}")
-            return f"Knowledge query: {response.text.strip()}"
+            with metrics.span(f"step.{getattr(step, 'tool', 'unrouted')}"):
+                return self.process_step(step)
         except Exception as e:
-            if any(word in step_lower for word in ['capital', 'distance']):
-                return f"Knowledge query unavailable (Error: {str(e)}). Please check your internet connection."
+            return f"Step {i} failed, using fallback: {str(e)}"
+
+    def run_steps(self, steps: list) -> list:
+        #Run independent steps concurrently and return results in step order
+        # process_step only reads its own step, so no step depends on
+        # another's output and all of them can be in flight at once.
+        steps = [classify_step(step) if isinstance(step, str) else step for step in steps]
+        if len(steps) <= 1 or self.max_workers <= 1:
+            return [self.run_step(i, step) for i, step in enumerate(steps, 1)]
+
+        # Uncached LLM-bound steps share one fused Gemini call instead of one call each
+        fused = [i for i, step in enumerate(steps) if self.needs_llm(step)]
+        if len(fused) < 2:
+            fused = []
+        fused_future = self.executor.submit(self.fuse_steps, [steps[i] for i in fused]) if fused else None
+
+        futures = {i: self.executor.submit(self.run_step, i + 1, step)
+                   for i, step in enumerate(steps) if i not in fused}
+        if fused_future is not None:
+            answers = fused_future.result()
+            for i, answer in zip(fused, answers):
+                # Per-step call only for the steps the fused answer did not cover
+                futures[i] = answer if answer is not None else self.executor.submit(self.run_step, i + 1, steps[i])
+        return [futures[i] if isinstance(futures[i], str) else futures[i].result() for i in range(len(steps))]
+
+    def needs_llm(self, step) -> bool:
+        #True for knowledge / translation steps whose answer is not already cached
+        # Only peeks: process_step does the counted lookups for the steps that are cached
+        if step.tool == "knowledge":
+            if self.facts.answer(step.text, peek=True) or \
+                    self.answers.lookup("knowledge", step.text, peek=True) is not None:
+                return False
+            return cached_text(self.model_for(step), self.knowledge_prompt(step.text), peek=True) is None
+        if step.tool == "translate" and step.argument:
+            if self.translator.memory.lookup(step.argument, peek=True) is not None:
+                return False
+            return cached_text(self.translator.model, self.translator.build_prompt(step.argument), peek=True) is None
+        return False
+
+    @timed("step.fused")
+    def fuse_steps(self, steps: list) -> list:
+        #Answer several LLM-bound steps with one structured call; None marks steps to retry alone
+        tasks = {}
+        for i, step in enumerate(steps, 1):
+            if step.tool == "translate":
+                tasks[str(i)] = {"type": "translate", "text": step.argument}
+            else:
+                tasks[str(i)] = {"type": "question", "text": step.text}
+
+        prompt = f"""Complete every task below. For "translate" tasks, translate the English text to German
+            and give only the German translation. For "question" tasks, answer the question concisely.
+            Respond with only a JSON object that maps each task id to its answer as a string.
+
+            {json.dumps(tasks, ensure_ascii=False)}"""
+        # The fused call needs the strong tier if any of its steps does; its JSON-only
+        # format must not compete with the agent's "I'll [action]" response format
+        model = self.plain_model("knowledge")
+        if self.tiers is not None and all(step_tier(step) == "fast" for step in steps):
+            model = self.plain_model("fast")
+        try:
+            raw = generate_text(model, prompt, cache=None)
+            answers = json.loads(re.sub(r"^```(?:json)?\s*|\s*```$", "", raw.strip()))
+            if not isinstance(answers, dict):
+                return [None] * len(steps)
+        except Exception:
+            return [None] * len(steps)
+
+        results = []
+        for i, step in enumerate(steps, 1):
+            answer = answers.get(str(i))
+            if not isinstance(answer, str) or not answer.strip():
+                results.append(None)
+                continue
+            answer = answer.strip()
+            # Seed the per-step cache keys so repeats skip even the fused call
+            if step.tool == "translate":
+                remember(self.translator.model, self.translator.build_prompt(step.argument), answer)
+                answer = self.translator.clean_translation(answer)
+                self.translator.remember(step.argument, answer)
+                results.append(f"Translated '{step.argument}' to German: '{answer}'")
             else:
-                return f"I cannot process this request right now (Error: {str(e)})"
+                remember(self.model_for(step), self.knowledge_prompt(step.text), answer)
+                self.answers.put("knowledge", step.text, answer)
+                results.append(f"Knowledge query: {answer}")
+        return results
 
     def create_final_answer(self, steps_results: list, original_query: str) -> str:
         #Create a consolidated final answer
@@ -156,7 +344,7 @@ class FullAgent:
                     final_parts.append(f"German translation: {match.group(1)}")
             
             elif "Calculated" in result:
-                match = re.search(r": ([\d.]+)$", result)
+                match = re.search(r": (-?[\d./]+)$", result)
                 if match:
                     final_parts.append(f"Calculation result: {match.group(1)}")
             
@@ -166,24 +354,19 @@ class FullAgent:
         
         return " | ".join(final_parts)
 
+    @timed("query")
     def process_query(self, query: str) -> str:
         #Main processing function with comprehensive fallback behavior
         try:
-            if self.is_multi_step(query):
-                steps = self.split_query(query)
+            plan = self.plan(query)
+            if plan.multi_step:
+                steps = plan.steps
                 
                 response = f"I need to break this down into {len(steps)} steps:\n\n"
-                steps_results = []
-                
-                for i, step in enumerate(steps, 1):
-                    try:
-                        step_result = self.process_step(step)
-                        response += f"Step {i}: {step_result}\n"
-                        steps_results.append(step_result)
-                    except Exception as e:
-                        fallback_msg = f"Step {i} failed, using fallback: {str(e)}"
-                        response += f"Step {i}: {fallback_msg}\n"
-                        steps_results.append(fallback_msg)
+                steps_results = self.run_steps(steps)
+
+                for i, step_result in enumerate(steps_results, 1):
+                    response += f"Step {i}: {step_result}\n"
 
                 try:
                     final_answer = self.create_final_answer(steps_results, query)
@@ -193,15 +376,7 @@ class FullAgent:
                 
             else:
                 try:
-                    step_result = self.process_step(query)
-                    if "Knowledge query:" in step_result:
-                        response = f"Based on my knowledge:\n\n{step_result.replace('Knowledge query: ', '')}"
-                    elif "Translated" in step_result:
-                        response = f"I'll translate this for you.\n\n{step_result}"
-                    elif "Calculated" in step_result:
-                        response = f"I'll calculate this for you.\n\n{step_result}"
-                    else:
-                        response = step_result
+                    response = self.format_single_result(self.process_step(plan.steps[0]))
                 except Exception as e:
                     response = f"I'm unable to process your request right now. Error: {str(e)}"
             
@@ -217,31 +392,63 @@ class FullAgent:
                 pass
             return fallback_response
 
+    def format_single_result(self, step_result: str) -> str:
+        if "Knowledge query:" in step_result:
+            return f"Based on my knowledge:\n\n{step_result.replace('Knowledge query: ', '')}"
+        elif "Translated" in step_result:
+            return f"I'll translate this for you.\n\n{step_result}"
+        elif "Calculated" in step_result:
+            return f"I'll calculate this for you.\n\n{step_result}"
+        else:
+            return step_result
+
+    def stream_query(self, query: str):
+        #Like process_query, but yields a single-step knowledge answer as it is generated
+        try:
+            plan = self.plan(query)
+            if plan.multi_step:
+                yield self.process_query(query)
+                return
+
+            step_result = self.process_step(plan.steps[0], stream=True)
+            if isinstance(step_result, str):
+                response = self.format_single_result(step_result)
+                yield response
+            else:
+                parts = []
+                for chunk in step_result:
+                    if not parts and chunk == "Knowledge query: ":
+                        chunk = "Based on my knowledge:\n\n"
+                    parts.append(chunk)
+                    yield chunk
+                response = "".join(parts).strip()
+        except Exception as e:
+            response = f"I'm unable to process your request right now. Error: {str(e)}"
+            yield response
+
+        # The log always records the full assembled text
+        self.save_interaction(query, response)
+
+    def new_session(self, session_id: str) -> "FullAgent":
+        #Return an agent with its own memory that shares this agent's model, tools, pool and log
+        session = copy.copy(self)
+        session.session_id = session_id
+        digest = hashlib.sha1(session_id.encode("utf-8")).hexdigest()[:16]
+        session.memory = InteractionStore(self.log, index_path=f"{self.log.path}.{digest}.idx",
+                                          ring_size=self.memory.recent.maxlen, session=session_id)
+        return session
+
+    @property
+    def conversation_memory(self) -> list:
+        #Recent turns as dicts (older turns are on disk, see show_history)
+        return [interaction.to_dict() for interaction in self.memory.recent]
+
+    @timed("logging")
     def save_interaction(self, query: str, response: str):
         """Save interaction to memory and file with fallback"""
-        interaction = {
-            "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            "query": query,
-            "response": response
-        }
-        
-        # Always save to memory first
+        # The store keeps the turn in memory first, then appends only the new entry to file
         try:
-            self.conversation_memory.append(interaction)
-        except Exception:
-            # Initialize memory if something went wrong
-            self.conversation_memory = [interaction]
-        
-        # Auto-save to file with fallback
-        try:
-            with open("level3_interactions.txt", 'w', encoding='utf-8') as f:
-                f.write("=== FULL AGENT CONVERSATION LOG ===\n\n")
-                for i, entry in enumerate(self.conversation_memory, 1):
-                    f.write(f"CONVERSATION {i}:\n")
-                    f.write(f"Time: {entry['timestamp']}\n")
-                    f.write(f"Query: {entry['query']}\n")
-                    f.write(f"Response: {entry['response']}\n")
-                    f.write("-" * 50 + "\n\n")
+            self.memory.add(query, response)
         except Exception:
             # Fallback: Try simpler filename
             try:
@@ -252,18 +459,30 @@ class FullAgent:
                 # Final fallback: just continue without saving to file
                 pass
 
-    def show_history(self):
-        #Display conversation history with fallback
+    def load_history(self):
+        #Refill recent conversation memory from the interaction log
         try:
-            if not self.conversation_memory:
+            self.memory.load()
+        except Exception:
+            self.memory.recent.clear()
+
+    def show_history(self, page: int = None, page_size: int = 10):
+        #Display one page of conversation history (default: the latest) with fallback
+        try:
+            total = len(self.memory)
+            if not total:
                 print("No conversation history available.")
                 return
-            
-            print(f"\nConversation History ({len(self.conversation_memory)} entries):")
-            for i, entry in enumerate(self.conversation_memory, 1):
-                print(f"{i}. [{entry.get('timestamp', 'Unknown time')}]")
-                print(f"   Query: {entry.get('query', 'Unknown query')}")
-                response = entry.get('response', 'Unknown response')
+
+            pages = (total + page_size - 1) // page_size
+            page = pages if page is None else min(max(page, 1), pages)
+            start = (page - 1) * page_size
+
+            print(f"\nConversation History ({total} entries, page {page} of {pages}):")
+            for i, entry in enumerate(self.memory.page(start, page_size), start + 1):
+                print(f"{i}. [{entry.time_str}]")
+                print(f"   Query: {entry.query}")
+                response = entry.response
                 print(f"   Response: {response[:80]}{'...' if len(response) > 80 else ''}")
                 print()
         except Exception as e:
@@ -273,8 +492,8 @@ class FullAgent:
 def main():
     #Main CLI interface
     print("=== Level 3 - Full Agentic AI ===")
-    print("Commands: 'quit' to exit | 'history' to view past conversations")
-    print("(All conversations auto-saved to conversation_history.txt)\n")
+    print("Commands: 'quit' to exit | 'history [page]' to view past conversations")
+    print("(All conversations auto-saved to level3_interactions.jsonl)\n")
     
     try:
         agent = FullAgent()
@@ -288,16 +507,16 @@ def main():
             user_input = input("\nYou: ").strip()
             
             if user_input.lower() == 'quit':
-                print("Goodbye! Your conversation has been saved to conversation_history.txt")
+                print("Goodbye! Your conversation has been saved to level3_interactions.jsonl")
                 break
-            elif user_input.lower() == 'history':
-                agent.show_history()
+            elif user_input.lower().split()[:1] == ['history']:
+                page = user_input.split()[1:2]
+                agent.show_history(int(page[0]) if page and page[0].isdigit() else None)
                 continue
             elif not user_input:
                 continue
             
-            response = agent.process_query(user_input)
-            print(f"Bot: {response}")
+            render_stream(agent.stream_query(user_input))
             
         except KeyboardInterrupt:
             print("\nGoodbye!")
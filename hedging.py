@@ -0,0 +1,83 @@
+#Hedging - race a fallback against a slow primary once it passes a latency percentile
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+class Hedger:
+    def __init__(self, percentile: float = 95.0, default_delay: float = 2.0, min_delay: float = 0.25,
+                 min_samples: int = 20, window: int = 200, max_workers: int = 32):
+        # The hedge delay per key is the percentile of that key's recent primary latencies
+        # (default_delay until min_samples are seen, never below min_delay)
+        self.percentile = percentile
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.window = window
+        self.hedged = 0
+        self.fallback_wins = 0
+
+        self._lock = threading.Lock()
+        self._latencies = {}  # key -> deque of recent primary latencies in seconds
+        # Own pool: callers often run on the agent's step pool and must not wait on it
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedge")
+
+    def observe(self, key: str, seconds: float):
+        with self._lock:
+            latencies = self._latencies.get(key)
+            if latencies is None:
+                latencies = self._latencies[key] = deque(maxlen=self.window)
+            latencies.append(seconds)
+
+    def delay(self, key: str) -> float:
+        #Seconds to wait for the primary before firing the fallback
+        with self._lock:
+            latencies = sorted(self._latencies.get(key, ()))
+        if len(latencies) < self.min_samples:
+            return self.default_delay
+        index = min(len(latencies) - 1, int(len(latencies) * self.percentile / 100))
+        return max(self.min_delay, latencies[index])
+
+    def run(self, key: str, primary, fallback):
+        #Return primary()'s result; a None result or error falls back at once, and a primary
+        # slower than the hedge delay races fallback(), with the first good answer winning
+        start = time.perf_counter()
+        first = self._pool.submit(primary)
+        # Every primary latency is recorded, including those that lose the race
+        first.add_done_callback(lambda f: self.observe(key, time.perf_counter() - start))
+
+        done, _ = wait([first], timeout=self.delay(key))
+        if done:
+            if _succeeded(first):
+                return first.result()
+            return fallback()
+
+        with self._lock:
+            self.hedged += 1
+        # A fallback still queued behind a busy pool when the primary succeeds never starts;
+        # one already running finishes unobserved
+        won = threading.Event()
+        first.add_done_callback(lambda f: _succeeded(f) and won.set())
+        second = self._pool.submit(lambda: None if won.is_set() else fallback())
+        pending = {first, second}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in (first, second):
+                if future in done and _succeeded(future):
+                    if future is second:
+                        with self._lock:
+                            self.fallback_wins += 1
+                    return future.result()
+        # Both failed: surface the fallback's error, as an unhedged fallback would
+        return second.result()
+
+    def stats(self) -> dict:
+        with self._lock:
+            keys = list(self._latencies)
+            stats = {"hedged": self.hedged, "fallback_wins": self.fallback_wins}
+        stats["delays"] = {key: self.delay(key) for key in keys}
+        return stats
+
+def _succeeded(future) -> bool:
+    return future.exception() is None and future.result() is not None
@@ -0,0 +1,192 @@
+#Instrumentation - spans, latency histograms, token usage and optional profiling
+
+import atexit
+import bisect
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+# Histogram upper bounds in seconds (the last bucket is +Inf)
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_NULL_SPAN = nullcontext()
+
+class Histogram:
+    def __init__(self, buckets: tuple = BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def percentile(self, pct: float) -> float:
+        #Upper bound of the bucket holding the pct-th observation
+        if not self.count:
+            return 0.0
+        target = pct / 100 * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return float("inf")
+
+class _Span:
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics: "Metrics", name: str):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, time.perf_counter() - self.start)
+
+class Metrics:
+    def __init__(self, enabled: bool = False):
+        # When disabled, span() hands back one shared no-op context manager
+        self.enabled = enabled
+        self.spans = {}     # span name -> Histogram
+        self.counters = {}  # (metric, labels) -> value
+        self._lock = threading.Lock()
+
+    def span(self, name: str):
+        return _Span(self, name) if self.enabled else _NULL_SPAN
+
+    def observe(self, name: str, seconds: float):
+        with self._lock:
+            histogram = self.spans.get(name)
+            if histogram is None:
+                histogram = self.spans[name] = Histogram()
+            histogram.observe(seconds)
+
+    def increment(self, metric: str, amount: float = 1, **labels):
+        key = (metric, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def record_usage(self, model_name: str, response, saved_tokens: int = 0):
+        #Count a Gemini call, the token counts from its usage_metadata and prompt tokens saved
+        if not self.enabled:
+            return
+        self.increment("llm_calls_total", model=model_name)
+        if saved_tokens:
+            self.increment("llm_prompt_tokens_saved_total", saved_tokens, model=model_name)
+        usage = getattr(response, "usage_metadata", None)
+        for kind, field in (("prompt", "prompt_token_count"), ("output", "candidates_token_count"),
+                            ("cached", "cached_content_token_count"), ("total", "total_token_count")):
+            count = getattr(usage, field, None)
+            if isinstance(count, int):
+                self.increment("llm_tokens_total", count, model=model_name, kind=kind)
+
+    def reset(self):
+        with self._lock:
+            self.spans.clear()
+            self.counters.clear()
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            spans = {
+                name: {
+                    "count": h.count,
+                    "sum_ms": h.sum * 1000,
+                    "p50_ms": h.percentile(50) * 1000,
+                    "p95_ms": h.percentile(95) * 1000,
+                    "p99_ms": h.percentile(99) * 1000,
+                }
+                for name, h in sorted(self.spans.items())
+            }
+            counters = [{"name": metric, "labels": dict(labels), "value": value}
+                        for (metric, labels), value in sorted(self.counters.items())]
+        return {"spans": spans, "counters": counters}
+
+    def prometheus_text(self) -> str:
+        #Render everything in the Prometheus text exposition format
+        lines = ["# TYPE agent_span_seconds histogram"]
+        with self._lock:
+            for name, h in sorted(self.spans.items()):
+                seen = 0
+                for bound, count in zip(h.buckets + (float("inf"),), h.counts):
+                    seen += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'agent_span_seconds_bucket{{span="{name}",le="{le}"}} {seen}')
+                lines.append(f'agent_span_seconds_sum{{span="{name}"}} {h.sum}')
+                lines.append(f'agent_span_seconds_count{{span="{name}"}} {h.count}')
+
+            typed = set()
+            for (metric, labels), value in sorted(self.counters.items()):
+                if metric not in typed:
+                    typed.add(metric)
+                    lines.append(f"# TYPE agent_{metric} counter")
+                label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+                lines.append(f"agent_{metric}{{{label_text}}} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str):
+        #Export to a file: JSON for *.json paths, Prometheus text otherwise
+        with open(path, "w", encoding="utf-8") as f:
+            if path.endswith(".json"):
+                json.dump(self.to_dict(), f, indent=2)
+            else:
+                f.write(self.prometheus_text())
+
+def timed(name: str):
+    #Decorator that records a span for every call while metrics are enabled
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not metrics.enabled:
+                return fn(*args, **kwargs)
+            with metrics.span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+@contextmanager
+def profiling(mode: str = None, output: str = None, top: int = 20):
+    #Profile the enclosed block: "cpu" (cProfile) or "memory" (tracemalloc); None does nothing
+    # Profilers are imported only when asked for, keeping them off the startup path
+    if mode == "cpu":
+        import cProfile
+        import pstats
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            if output:
+                profiler.dump_stats(output)
+            pstats.Stats(profiler, stream=sys.stderr).sort_stats("cumulative").print_stats(top)
+    elif mode == "memory":
+        import tracemalloc
+        tracemalloc.start()
+        try:
+            yield
+        finally:
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            print(f"Top {top} allocation sites:", file=sys.stderr)
+            for stat in snapshot.statistics("lineno")[:top]:
+                print(f"  {stat}", file=sys.stderr)
+            if output:
+                snapshot.dump(output)
+    else:
+        yield
+
+# Process-wide metrics; enabled by AGENT_METRICS=1 or by setting AGENT_METRICS_FILE
+_metrics_file = os.getenv("AGENT_METRICS_FILE")
+metrics = Metrics(enabled=os.getenv("AGENT_METRICS") == "1" or bool(_metrics_file))
+if _metrics_file:
+    atexit.register(metrics.write, _metrics_file)
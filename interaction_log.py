@@ -0,0 +1,117 @@
+#Interaction Log - Append-only JSONL writer shared by all three levels
+
+import atexit
+import json
+import os
+import threading
+from typing import Callable, Dict, Any, Iterator, List, Optional
+
+class InteractionLog:
+    def __init__(self, path: str, fsync_every: int = 20, flush_interval: Optional[float] = None):
+        # Each interaction is one JSON line; appends never rewrite old entries
+        self.path = path
+        self.fsync_every = fsync_every
+        self.flush_interval = flush_interval
+
+        self._lock = threading.Lock()
+        self._pending = []
+        self._written = []  # (callback, offset) for pending entries that asked to be told
+        self._file = None
+        self._unsynced = 0
+        # Byte offset where the next entry will start, so callers can index entries
+        self._end = os.path.getsize(path) if os.path.exists(path) else 0
+
+        # Optional background flusher so the reply path never touches disk
+        self._stop = threading.Event()
+        self._thread = None
+        if flush_interval:
+            self._thread = threading.Thread(target=self._flush_loop, name="interaction-log", daemon=True)
+            self._thread.start()
+
+        atexit.register(self.close)
+
+    def append(self, entry: Dict[str, Any], on_written: Optional[Callable[[int], None]] = None) -> int:
+        #Queue one entry, write it now unless a background flusher owns the disk, and return its byte offset
+        # on_written(offset) is called once the entry has actually been written to the file
+        line = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            offset = self._end
+            self._end += len(line)
+            self._pending.append(line)
+            if on_written is not None:
+                self._written.append((on_written, offset))
+        if self._thread is None:
+            self.flush()
+        return offset
+
+    def flush(self, sync: bool = False):
+        #Write pending entries and fsync every fsync_every entries (or when asked)
+        with self._lock:
+            if self._pending:
+                if self._file is None:
+                    self._file = open(self.path, "ab")
+                self._file.writelines(self._pending)
+                self._file.flush()
+                self._unsynced += len(self._pending)
+                self._pending = []
+                # Still under the lock, so callbacks run in write order
+                written, self._written = self._written, []
+                for callback, offset in written:
+                    try:
+                        callback(offset)
+                    except Exception:
+                        # An index that cannot be updated can be rebuilt from the log later
+                        pass
+            if self._file is not None and self._unsynced and (sync or self._unsynced >= self.fsync_every):
+                os.fsync(self._file.fileno())
+                self._unsynced = 0
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                # Keep the flusher alive; entries stay pending until the next try
+                pass
+
+    def close(self):
+        #Stop the background flusher and push everything to disk
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+        try:
+            self.flush(sync=True)
+        finally:
+            with self._lock:
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+
+    def read(self) -> Iterator[Dict[str, Any]]:
+        #Yield every logged entry in order, skipping torn or corrupt lines
+        self.flush()
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+    def read_at(self, offsets: List[int]) -> List[Optional[Dict[str, Any]]]:
+        #Read the entries starting at the given byte offsets (None for unreadable ones)
+        self.flush()
+        entries = []
+        with open(self.path, "rb") as f:
+            for offset in offsets:
+                f.seek(offset)
+                try:
+                    entries.append(json.loads(f.readline()))
+                except ValueError:
+                    entries.append(None)
+        return entries
@@ -0,0 +1,135 @@
+#Interaction Store - bounded in-RAM ring of recent turns backed by the log and an offset index
+
+import json
+import os
+import struct
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import List, Optional
+from interaction_log import InteractionLog
+
+_OFFSET = struct.Struct("<Q")  # one fixed-width byte offset per entry in the index file
+
+class Interaction:
+    __slots__ = ("timestamp", "query", "response", "session")
+
+    def __init__(self, query: str, response: str, timestamp: float = None, session: str = None):
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self.query = query
+        self.response = response
+        self.session = session
+
+    @property
+    def time_str(self) -> str:
+        return datetime.fromtimestamp(self.timestamp).strftime('%Y-%m-%d %H:%M:%S')
+
+    def to_dict(self) -> dict:
+        entry = {"timestamp": self.timestamp, "query": self.query, "response": self.response}
+        if self.session is not None:
+            entry["session"] = self.session
+        return entry
+
+    @classmethod
+    def from_dict(cls, entry: dict) -> "Interaction":
+        timestamp = entry.get("timestamp")
+        if isinstance(timestamp, str):
+            # Entries written before timestamps were stored as epoch seconds
+            timestamp = datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S').timestamp()
+        return cls(entry.get("query", ""), entry.get("response", ""), timestamp, entry.get("session"))
+
+class InteractionStore:
+    def __init__(self, log: InteractionLog, index_path: Optional[str] = None,
+                 ring_size: int = 50, session: str = None):
+        # Only the last ring_size turns stay in RAM; older ones are read back through the index
+        self.log = log
+        self.index_path = index_path
+        self.session = session
+        self.recent = deque(maxlen=ring_size)
+
+        # The index file is opened per write and never held open: a server keeps
+        # thousands of sessions, each with its own index
+        self._lock = threading.Lock()
+        self._discarded = False
+        self.count = 0
+        if index_path and os.path.exists(index_path):
+            self.count = os.path.getsize(index_path) // _OFFSET.size
+
+    def __len__(self) -> int:
+        return self.count
+
+    def add(self, query: str, response: str) -> Interaction:
+        #Keep the turn in RAM, append it to the log and record its offset in the index
+        interaction = Interaction(query, response, session=self.session)
+        with self._lock:
+            self.recent.append(interaction)
+            self.count += 1
+        # The offset is indexed only once the log line is on disk, so a crash with
+        # lines still pending cannot leave offsets pointing past the end of the log
+        self.log.append(interaction.to_dict(), on_written=self._index_offset if self.index_path else None)
+        return interaction
+
+    def _index_offset(self, offset: int):
+        with self._lock:
+            if self._discarded:
+                return
+            with open(self.index_path, "ab") as f:
+                f.write(_OFFSET.pack(offset))
+
+    def page(self, start: int, size: int) -> List[Interaction]:
+        #Return up to size turns starting at position start (0 = oldest)
+        start = max(0, start)
+        end = min(self.count, start + size)
+        if start >= end:
+            return []
+
+        # Recent turns are served straight from the ring
+        first_recent = self.count - len(self.recent)
+        if start >= first_recent:
+            return list(self.recent)[start - first_recent:end - first_recent]
+        if not self.index_path:
+            # Without an index only the ring is available
+            return list(self.recent)[max(start, first_recent) - first_recent:end - first_recent]
+
+        # Pending log lines are written (and indexed) first
+        self.log.flush()
+        with open(self.index_path, "rb") as f:
+            f.seek(start * _OFFSET.size)
+            data = f.read((end - start) * _OFFSET.size)
+        offsets = [offset for (offset,) in _OFFSET.iter_unpack(data)]
+        return [Interaction.from_dict(entry) for entry in self.log.read_at(offsets) if entry is not None]
+
+    def load(self):
+        #Refill the ring from disk, rebuilding the index from the log if it is missing
+        if self.index_path and not os.path.exists(self.index_path):
+            self.rebuild_index()
+        with self._lock:
+            self.recent.clear()
+        for interaction in self.page(self.count - self.recent.maxlen, self.recent.maxlen):
+            self.recent.append(interaction)
+
+    def rebuild_index(self):
+        #Scan the log once and write the offsets of this session's entries
+        offsets, offset = [], 0
+        self.log.flush()
+        if os.path.exists(self.log.path):
+            with open(self.log.path, "rb") as f:
+                for line in f:
+                    try:
+                        if json.loads(line).get("session") == self.session:
+                            offsets.append(offset)
+                    except ValueError:
+                        pass
+                    offset += len(line)
+        with self._lock:
+            with open(self.index_path, "wb") as f:
+                f.writelines(_OFFSET.pack(o) for o in offsets)
+            self.count = len(offsets)
+
+    def discard(self):
+        #Delete the index file (e.g. when a server evicts the session); the log keeps every turn
+        with self._lock:
+            self._discarded = True
+            if self.index_path and os.path.exists(self.index_path):
+                os.remove(self.index_path)
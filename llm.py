@@ -0,0 +1,91 @@
+#LLM helpers - single entry point for generate_content calls
+
+import hashlib
+from response_cache import ResponseCache, shared_cache
+from single_flight import in_flight
+from rate_limiter import limiter, estimate_tokens
+from instrumentation import metrics
+
+def model_name_of(model) -> str:
+    #Cache / coalescing name: the model name plus a digest of any system instruction
+    name = getattr(model, "model_name", type(model).__name__)
+    system = getattr(model, "system_instruction", None)
+    if isinstance(system, str) and system:
+        return f"{name}#{hashlib.sha1(system.encode('utf-8')).hexdigest()[:12]}"
+    return name
+
+def saved_prompt_tokens(model) -> int:
+    #Tokens a call no longer sends in its payload because the system prompt rides on the model
+    system = getattr(model, "system_instruction", None)
+    return estimate_tokens(system) if isinstance(system, str) and system else 0
+
+def generate_text(model, prompt: str, cache: ResponseCache = shared_cache) -> str:
+    #Return the stripped response text, serving repeats from the response cache
+    name = model_name_of(model)
+    if cache is not None:
+        cached = cache.get(name, prompt)
+        if cached is not None:
+            return cached
+
+    def call():
+        # Quota, concurrency and retries are handled by the shared limiter
+        with metrics.span("llm"):
+            response = limiter.call(lambda: model.generate_content(prompt), estimate_tokens(prompt))
+        metrics.record_usage(name, response, saved_prompt_tokens(model))
+        text = response.text.strip()
+        if cache is not None:
+            cache.put(name, prompt, text)
+        return text
+
+    # Identical prompts already in flight wait for that call instead of making their own
+    return in_flight.do((name, prompt), call)
+
+def stream_text(model, prompt: str, cache: ResponseCache = shared_cache):
+    #Yield response text chunk by chunk; the assembled text is cached like generate_text
+    name = model_name_of(model)
+    if cache is not None:
+        cached = cache.get(name, prompt)
+        if cached is not None:
+            yield cached
+            return
+
+    parts = []
+    # The limiter covers opening the stream; chunks are not retried once they start
+    with metrics.span("llm.stream_open"):
+        response = limiter.call(lambda: model.generate_content(prompt, stream=True), estimate_tokens(prompt))
+    chunk = None
+    for chunk in response:
+        text = chunk.text
+        if not parts:
+            # Match generate_text, which strips leading whitespace
+            text = text.lstrip()
+        if text:
+            parts.append(text)
+            yield text
+
+    # Streamed responses report token usage on the last chunk
+    metrics.record_usage(name, chunk, saved_prompt_tokens(model))
+    if cache is not None:
+        cache.put(name, prompt, "".join(parts).strip())
+
+def render_stream(chunks, prefix: str = "Bot: ") -> str:
+    #Print chunks as they arrive and return the full assembled text
+    print(prefix, end="", flush=True)
+    parts = []
+    for chunk in chunks:
+        print(chunk, end="", flush=True)
+        parts.append(chunk)
+    print("\n")
+    return "".join(parts).strip()
+
+def cached_text(model, prompt: str, cache: ResponseCache = shared_cache, peek: bool = False):
+    #Return a cached response for a prompt without calling the model (None on a miss)
+    # peek=True only checks: no hit / miss is counted and LRU order is unchanged
+    if cache is None:
+        return None
+    return cache.get(model_name_of(model), prompt, peek=peek)
+
+def remember(model, prompt: str, text: str, cache: ResponseCache = shared_cache):
+    #Cache text obtained another way (e.g. a batched or fused call) under a prompt's key
+    if cache is not None:
+        cache.put(model_name_of(model), prompt, text)
@@ -0,0 +1,120 @@
+#Model Registry - process-wide, lazily built Gemini models shared by every class and tool
+
+import hashlib
+import os
+import threading
+
+# google.generativeai is imported on the first real Gemini call, not at startup
+
+# Default model per role; override with GEMINI_MODEL_<ROLE>, e.g. GEMINI_MODEL_KNOWLEDGE
+ROLE_MODELS = {
+    "chat": "gemini-2.5-flash",          # Level 1 and Level 2 chatbots
+    "router": "gemini-2.0-flash-exp",    # FullAgent translation / calculation fallbacks
+    "knowledge": "gemini-2.0-flash-exp", # FullAgent knowledge answers
+    "translator": "gemini-2.0-flash-exp",
+    "fast": "gemini-2.0-flash-lite",     # FullAgent fast tier for short, simple knowledge steps
+}
+
+_lock = threading.RLock()
+_configured = False
+_models = {}
+
+# Optional factory(model_name) -> model used instead of Gemini (see set_backend)
+_backend = None
+
+def model_name_for(role: str) -> str:
+    return os.getenv(f"GEMINI_MODEL_{role.upper()}", ROLE_MODELS[role])
+
+def configure():
+    #Configure the SDK once per process
+    global _configured
+    if _configured:
+        return
+    with _lock:
+        if _configured:
+            return
+        import google.generativeai as genai
+        genai.configure(api_key=require_api_key())
+        _configured = True
+
+def require_api_key() -> str:
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        raise ValueError("Missing GEMINI_API_KEY environment variable")
+    return api_key
+
+class LazyModel:
+    def __init__(self, name: str, system_instruction: str = None):
+        # Stands in for the model until its first call, so constructing bots imports no SDK
+        self.model_name = name
+        self.system_instruction = system_instruction
+        self._model = None
+
+    def resolve(self):
+        #Build the real model (importing the SDK if needed) on first use
+        if self._model is None:
+            with _lock:
+                if self._model is None:
+                    self._model = _build(self.model_name, self.system_instruction)
+        return self._model
+
+    def generate_content(self, prompt, stream: bool = False, **kwargs):
+        return self.resolve().generate_content(prompt, stream=stream, **kwargs)
+
+    def __getattr__(self, name: str):
+        # Everything else (calls, generate_content_async, ...) comes from the real model
+        return getattr(self.resolve(), name)
+
+def get_model(role: str, system_instruction: str = None) -> LazyModel:
+    #Return the shared model for a role; it is built on its first generate_content call
+    # A system instruction is sent once with the model instead of in every prompt, so
+    # each distinct instruction gets its own instance
+    name = model_name_for(role)
+    key = name
+    if system_instruction:
+        key = f"{name}#{hashlib.sha1(system_instruction.encode('utf-8')).hexdigest()[:12]}"
+    model = _models.get(key)
+    if model is not None:
+        return model
+
+    with _lock:
+        if _backend is None and os.getenv("LLM_BACKEND") != "stub":
+            # Fail at construction time, as before, without importing the SDK
+            require_api_key()
+        # Roles that resolve to the same model name share one instance and client
+        if key not in _models:
+            _models[key] = LazyModel(name, system_instruction)
+        return _models[key]
+
+def warm(roles=None):
+    #Build the models for roles (default: all) now, e.g. before a server takes traffic
+    for role in roles or ROLE_MODELS:
+        get_model(role).resolve()
+
+def _build(name: str, system_instruction: str = None):
+    options = {"system_instruction": system_instruction} if system_instruction else {}
+    if _backend is not None:
+        return _backend(name, **options)
+    if os.getenv("LLM_BACKEND") == "stub":
+        from stub_backend import StubModel
+        return StubModel(name, latency=float(os.getenv("STUB_LATENCY", "0")),
+                         jitter=float(os.getenv("STUB_JITTER", "0")), **options)
+    configure()
+    import google.generativeai as genai
+    return genai.GenerativeModel(name, **options)
+
+def set_backend(factory):
+    #Build models with factory(model_name, **options) instead of Gemini; None switches back to Gemini
+    # options holds system_instruction for models created with one.
+    # Any object with model_name and generate_content(prompt, stream=False) works as a model.
+    global _backend
+    with _lock:
+        _backend = factory
+        _models.clear()
+
+def reset():
+    #Drop every cached model, e.g. after changing GEMINI_MODEL_* or the API key
+    global _configured
+    with _lock:
+        _models.clear()
+        _configured = False
@@ -0,0 +1,17 @@
+#Prompts - reusable templates that send the system prompt once as a system instruction
+
+from model_registry import get_model
+
+class PromptTemplate:
+    def __init__(self, system: str, turn: str = "User: {input}"):
+        # The system prompt is attached to the model (system_instruction) instead of being
+        # pasted in front of every message; only the rendered turn is sent per call
+        self.system = system
+        self.turn = turn
+
+    def model(self, role: str):
+        #Shared model for a role that carries this template's system instruction
+        return get_model(role, system_instruction=self.system)
+
+    def render(self, **fields) -> str:
+        return self.turn.format(**fields)
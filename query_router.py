@@ -0,0 +1,175 @@
+#Query Router - single-pass tokenizer that turns a query into a typed step plan
+
+import re
+from functools import lru_cache
+from typing import NamedTuple, Optional, Tuple
+from calculator_tool import parse_expression
+
+# One alternation scanned once per query; every routing decision reads these tokens.
+# Keyword groups stay substring matches (no \b) to mirror the original `in` checks.
+_TOKEN = re.compile(r"""
+    (?P<then>\s+(?P<and_then>and\s+)?then\s+)                          # step separator
+  | (?P<math>\b(?:add|multiply|subtract|divide)\s+-?\d+(?:\.\d+)?            # "add 5 and 3", "divide 10 by 2",
+        (?:\s*(?:,|\band\b|\bby\b|\bfrom\b|\bto\b|\bwith\b)\s*-?\d+(?:\.\d+)?)+) # "add 1, 2 and 3"
+  | (?P<math_word>\b(?:add|plus|subtract|minus|multiply|times|divide|calculate)\b)
+  | (?P<infix>\d+(?:\.\d+)?\s*                                            # "5 + 3", "12 times 7"
+        (?:[-+*/xX÷×^]|\b(?:plus|minus|times|over|multiplied\s+by|divided\s+by)\b)\s*\d+)
+  | (?P<translate>translate)
+  | (?P<german>german)
+  | (?P<capital>capital)
+  | (?P<knowledge>distance|tell\ me)
+  | (?P<explain>why|explain)
+  | (?P<conj>\band\b)
+  | (?P<quote>['"])
+""", re.IGNORECASE | re.VERBOSE)
+
+_LEADING_JOIN = re.compile(r"(?:and\s+then\s+|,\s*|and\s+)", re.IGNORECASE)
+_TRAILING_JOIN = re.compile(r"(?:\s*,|\s+and)\s*$", re.IGNORECASE)
+
+class Token(NamedTuple):
+    kind: str
+    start: int
+    end: int
+
+class Step(NamedTuple):
+    tool: str                  # "translate", "calculate" or "knowledge"
+    text: str                  # the step as the user wrote it
+    span: Tuple[int, int]      # position of the step in the original query
+    argument: Optional[str]    # text to translate / expression to calculate
+
+class QueryPlan(NamedTuple):
+    query: str
+    multi_step: bool
+    steps: Tuple[Step, ...]    # one step unless multi_step
+    parts: Tuple[Step, ...]    # split_query result, even for single-step queries
+    has_math: bool             # Level 2 calculator detection
+    mixed_tasks: bool          # Level 2 "one type of task at a time" check
+
+def tokenize(query: str) -> Tuple[Token, ...]:
+    tokens = []
+    for m in _TOKEN.finditer(query):
+        kind = m.lastgroup
+        if kind == "then" and m.group("and_then"):
+            kind = "and_then"
+        tokens.append(Token(kind, m.start(), m.end()))
+    return tuple(tokens)
+
+def _is_expression(text: str) -> bool:
+    #True if the calculator parses text as arithmetic, not just a lone number
+    tree, _ = parse_expression(text.strip())
+    return tree is not None and tree[0] != "num"
+
+def _make_step(query: str, tokens, start: int, end: int) -> Step:
+    #Classify the query[start:end] slice using only the tokens inside it
+    inner = [t for t in tokens if t.start >= start and t.end <= end]
+    kinds = {t.kind for t in inner}
+    text = query[start:end]
+    if "translate" in kinds and "german" in kinds:
+        quotes = [t for t in inner if t.kind == "quote"]
+        argument = None
+        if len(quotes) >= 2 and quotes[1].start > quotes[0].end:
+            argument = query[quotes[0].end:quotes[1].start]
+        return Step("translate", text, (start, end), argument)
+    # "24/7 support" or "1939-1945" look like arithmetic but do not parse as an expression
+    if "math" in kinds or _is_expression(text):
+        return Step("calculate", text, (start, end), text)
+    return Step("knowledge", text, (start, end), None)
+
+def _strip_span(query: str, start: int, end: int) -> Tuple[int, int]:
+    while start < end and query[start].isspace():
+        start += 1
+    while end > start and query[end - 1].isspace():
+        end -= 1
+    return start, end
+
+def _split(query: str, tokens) -> Tuple[Step, ...]:
+    # 1. Explicit separators - "and then" wins over a bare "then"
+    separators = ([t for t in tokens if t.kind == "and_then"]
+                  or [t for t in tokens if t.kind == "then"])
+    if separators:
+        steps, start = [], 0
+        for sep in separators + [Token("end", len(query), len(query))]:
+            s, e = _strip_span(query, start, sep.start)
+            if e > s:
+                steps.append(_make_step(query, tokens, s, e))
+            start = sep.end
+        return tuple(steps)
+
+    # 2. Several "add X and Y" style expressions
+    maths = [t for t in tokens if t.kind == "math"]
+    if len(maths) > 1:
+        return tuple(_make_step(query, tokens, t.start, t.end) for t in maths)
+
+    # 3. translate 'text' ... german, plus whatever surrounds it
+    for i, t in enumerate(tokens):
+        if t.kind != "translate":
+            continue
+        rest = tokens[i + 1:]
+        quotes = [q for q in rest if q.kind == "quote"]
+        if len(quotes) < 2 or not query[t.end:quotes[0].start].isspace():
+            continue
+        german = next((g for g in rest if g.kind == "german" and g.start >= quotes[1].end), None)
+        if german is None:
+            continue
+
+        steps = []
+        before = _TRAILING_JOIN.sub("", query[:t.start].rstrip())
+        s, e = _strip_span(query, 0, len(before))
+        if e > s:
+            steps.append(_make_step(query, tokens, s, e))
+        steps.append(_make_step(query, tokens, t.start, german.end))
+        s, e = _strip_span(query, german.end, len(query))
+        join = _LEADING_JOIN.match(query, s)
+        s, e = _strip_span(query, join.end() if join else s, e)
+        if e > s:
+            steps.append(_make_step(query, tokens, s, e))
+        if len(steps) > 1:
+            return tuple(steps)
+        break
+
+    return (_make_step(query, tokens, 0, len(query)),)
+
+@lru_cache(maxsize=4096)
+def route(query: str) -> QueryPlan:
+    #Build the full plan for a query from a single tokenizing pass (cached per query string)
+    tokens = tokenize(query)
+    kinds = {}
+    for t in tokens:
+        kinds[t.kind] = kinds.get(t.kind, 0) + 1
+
+    has_translate = "translate" in kinds and "german" in kinds
+    has_math = bool(kinds.get("math"))
+    has_knowledge = "knowledge" in kinds or "capital" in kinds
+    multi_step = (
+        "then" in kinds
+        or "and_then" in kinds
+        or kinds.get("math", 0) > 1
+        or sum([has_translate, has_math, has_knowledge]) > 1
+    )
+
+    parts = _split(query, tokens)
+    steps = parts if multi_step else (_make_step(query, tokens, 0, len(query)),)
+
+    level2_math = has_math or "math_word" in kinds or "infix" in kinds
+    return QueryPlan(
+        query=query,
+        multi_step=multi_step,
+        steps=steps,
+        parts=parts,
+        has_math=level2_math,
+        # "add 5 and 3" contains its own "and"
+        mixed_tasks=level2_math and ("capital" in kinds or "explain" in kinds) and ("conj" in kinds or has_math),
+    )
+
+def step_tier(step: Step) -> str:
+    #Model tier for a step: "fast" for short lookups, "strong" for explanations and long questions
+    if step.tool != "knowledge":
+        return "fast"
+    kinds = {t.kind for t in tokenize(step.text)}
+    if "explain" in kinds or len(step.text.split()) > 12:
+        return "strong"
+    return "fast"
+
+def classify_step(text: str) -> Step:
+    #Route a standalone step string
+    return _make_step(text, tokenize(text), 0, len(text))
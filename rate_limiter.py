@@ -0,0 +1,170 @@
+#Rate Limiter - RPM/TPM token buckets, AIMD concurrency and retries for Gemini calls
+
+import os
+import random
+import threading
+import time
+from typing import Optional
+
+class RateLimitTimeout(TimeoutError):
+    pass
+
+class TokenBucket:
+    def __init__(self, per_minute: float):
+        # Refills continuously; a full minute's allowance can be spent as a burst
+        self.rate = per_minute / 60.0
+        self.capacity = float(per_minute)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def wait_time(self, amount: float, now: float) -> float:
+        #Seconds until amount can be taken (0 if it can be taken now)
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        # May go negative when a response used more tokens than estimated
+        self.level -= amount
+
+def estimate_tokens(prompt: str) -> int:
+    #Rough prompt size for the TPM bucket (~4 characters per token)
+    return len(prompt) // 4 + 1
+
+def is_throttled(error: Exception) -> bool:
+    #True for quota / 429 style errors that should shrink concurrency and be retried
+    if type(error).__name__ in ("ResourceExhausted", "TooManyRequests"):
+        return True
+    message = str(error).lower()
+    return any(signal in message for signal in ("429", "quota", "rate limit", "resource exhausted"))
+
+def is_transient(error: Exception) -> bool:
+    #Server-side errors worth retrying without treating them as throttling
+    if type(error).__name__ in ("ServiceUnavailable", "InternalServerError", "DeadlineExceeded"):
+        return True
+    message = str(error).lower()
+    return any(signal in message for signal in ("503", "unavailable", "try again"))
+
+class RateLimiter:
+    def __init__(self, rpm: Optional[float] = None, tpm: Optional[float] = None,
+                 max_concurrency: int = 16, min_concurrency: int = 1, max_retries: int = 4,
+                 base_delay: float = 0.5, max_delay: float = 30.0, deadline: Optional[float] = 60.0):
+        # Buckets keep request and token rates at quota; the AIMD limit caps calls in flight
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.limit = float(max_concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+
+        self.in_flight = 0
+        self.throttled = 0
+        self.retries = 0
+        self._random = random.Random()
+        self._cond = threading.Condition()
+
+    def _try_acquire(self, tokens: int) -> float:
+        #Take a slot and bucket capacity, or return how long to wait (caller holds _cond)
+        if self.in_flight >= max(self.min_concurrency, int(self.limit)):
+            return 0.05
+        now = time.monotonic()
+        wait = 0.0
+        for bucket, amount in ((self.requests, 1), (self.tokens, tokens)):
+            if bucket is not None:
+                wait = max(wait, bucket.wait_time(amount, now))
+        if wait > 0:
+            return wait
+        if self.requests is not None:
+            self.requests.take(1)
+        if self.tokens is not None:
+            self.tokens.take(tokens)
+        self.in_flight += 1
+        return 0.0
+
+    def _expires(self, deadline: Optional[float]) -> Optional[float]:
+        deadline = self.deadline if deadline is None else deadline
+        return None if deadline is None else time.monotonic() + deadline
+
+    def _remaining(self, expires: Optional[float], wait: float) -> float:
+        if expires is None:
+            return wait
+        remaining = expires - time.monotonic()
+        if remaining <= 0:
+            raise RateLimitTimeout("Gemini request deadline exceeded while waiting for quota")
+        return min(wait, remaining)
+
+    def acquire(self, tokens: int = 1, expires: Optional[float] = None):
+        #Block until a slot and quota are available or the deadline passes
+        with self._cond:
+            while True:
+                wait = self._try_acquire(tokens)
+                if wait == 0:
+                    return
+                self._cond.wait(self._remaining(expires, wait))
+
+    def release(self, throttled: bool = False, used_tokens: int = 0):
+        #Free a slot: additive increase on success, multiplicative decrease on throttling
+        with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                self.throttled += 1
+                self.limit = max(float(self.min_concurrency), self.limit / 2)
+            else:
+                self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+            if used_tokens and self.tokens is not None:
+                self.tokens.take(used_tokens)
+            self._cond.notify_all()
+
+    def backoff(self, attempt: int, error: Exception, expires: Optional[float]) -> float:
+        #Full-jitter exponential delay before retry attempt, or re-raise when out of retries
+        if attempt >= self.max_retries or not (is_throttled(error) or is_transient(error)):
+            raise error
+        delay = self._random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if expires is not None and time.monotonic() + delay > expires:
+            raise error
+        with self._cond:
+            self.retries += 1
+        return delay
+
+    def call(self, fn, tokens: int = 1, deadline: Optional[float] = None):
+        #Run fn() under the limiter, retrying throttled / transient failures with backoff
+        expires = self._expires(deadline)
+        attempt = 0
+        while True:
+            self.acquire(tokens, expires)
+            try:
+                result = fn()
+            except Exception as e:
+                self.release(throttled=is_throttled(e))
+                time.sleep(self.backoff(attempt, e, expires))
+                attempt += 1
+                continue
+            self.release(used_tokens=_extra_tokens(result, tokens))
+            return result
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {"limit": self.limit, "in_flight": self.in_flight,
+                    "throttled": self.throttled, "retries": self.retries}
+
+def _extra_tokens(response, estimated: int) -> int:
+    #Tokens the response actually used beyond the estimate charged up front
+    usage = getattr(response, "usage_metadata", None)
+    total = getattr(usage, "total_token_count", None)
+    return max(0, total - estimated) if isinstance(total, int) else 0
+
+def _env_float(name: str) -> Optional[float]:
+    value = os.getenv(name)
+    return float(value) if value else None
+
+# Process-wide limiter in front of every generate_content call
+limiter = RateLimiter(
+    rpm=_env_float("GEMINI_RPM"),
+    tpm=_env_float("GEMINI_TPM"),
+    max_concurrency=int(os.getenv("GEMINI_MAX_CONCURRENCY", "16")),
+    deadline=_env_float("GEMINI_DEADLINE") or 60.0,
+)
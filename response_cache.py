@@ -0,0 +1,130 @@
+#Response Cache - LRU/TTL cache for LLM responses with optional sqlite backend
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+class ResponseCache:
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = None, path: Optional[str] = None):
+        # In-memory LRU in front of an optional on-disk table for warm restarts
+        self.max_size = max_size
+        self.ttl = ttl
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._db = None
+        self._writes = 0
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT, created REAL)"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def make_key(model_name: str, prompt: str) -> str:
+        #Key on model name plus the prompt with whitespace normalized
+        # Case is kept: "Translate Polish" and "Translate polish" need different answers
+        normalized = re.sub(r"\s+", " ", prompt).strip()
+        return hashlib.sha256(f"{model_name}\0{normalized}".encode("utf-8")).hexdigest()
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl is not None and time.time() - created > self.ttl
+
+    def get(self, model_name: str, prompt: str, peek: bool = False) -> Optional[str]:
+        #Cached value or None; peek=True leaves stats and LRU order untouched
+        key = self.make_key(model_name, prompt)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry[1]):
+                if not peek:
+                    del self._entries[key]
+                entry = None
+
+            if entry is None and self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, created FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and not self._expired(row[1]):
+                    entry = (row[0], row[1])
+                    if not peek:
+                        self._remember(key, entry)
+
+            if peek:
+                return None if entry is None else entry[0]
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, model_name: str, prompt: str, value: str):
+        key = self.make_key(model_name, prompt)
+        entry = (value, time.time())
+        with self._lock:
+            self._remember(key, entry)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, created) VALUES (?, ?, ?)",
+                    (key, value, entry[1]),
+                )
+                self._writes += 1
+                if self._writes % 100 == 0:
+                    self._prune_disk()
+                self._db.commit()
+
+    def _remember(self, key: str, entry: tuple):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _prune_disk(self):
+        # Keep the on-disk table bounded too, dropping the oldest rows first
+        if self.ttl is not None:
+            self._db.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,))
+        self._db.execute(
+            "DELETE FROM responses WHERE key NOT IN "
+            "(SELECT key FROM responses ORDER BY created DESC LIMIT ?)",
+            (self.max_size * 10,),
+        )
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "size": len(self._entries),
+            }
+
+def _env_float(name: str) -> Optional[float]:
+    value = os.getenv(name)
+    return float(value) if value else None
+
+# Process-wide cache used by every generate_content call site
+shared_cache = ResponseCache(
+    max_size=int(os.getenv("RESPONSE_CACHE_SIZE", "1024")),
+    ttl=_env_float("RESPONSE_CACHE_TTL"),
+    path=os.getenv("RESPONSE_CACHE_PATH"),
+)
@@ -0,0 +1,244 @@
+#Semantic Cache - answers for near-duplicate questions from hashed n-gram vectors (NumPy)
+
+import atexit
+import itertools
+import json
+import os
+import re
+import threading
+import time
+import zlib
+from typing import Optional
+
+import numpy as np
+
+# Words that change the phrasing but not the question
+_STOPWORDS = frozenset("""
+    a an the is are was were be of in on at to for from about me tell please what whats which
+    can could you would i do does did give show find s city
+""".split())
+_WORD = re.compile(r"[a-z0-9]+")
+# Words that change the answer however close the rest of the question is; never treated as common
+_NUMBER_WORDS = frozenset("""
+    zero one two three four five six seven eight nine ten eleven twelve twenty thirty forty fifty
+    hundred thousand million billion first second third fourth fifth sixth seventh eighth ninth tenth
+    last next previous half quarter double triple
+""".split())
+
+def content_words(text: str) -> list:
+    text = re.sub(r"'s\b", "", text.casefold())
+    return [word for word in _WORD.findall(text) if word not in _STOPWORDS]
+
+def _bucket(feature: str, dim: int) -> int:
+    # crc32 rather than hash(): vectors must stay valid across processes
+    return zlib.crc32(feature.encode("utf-8")) % dim
+
+def is_number(word: str) -> bool:
+    return word.isdigit() or word in _NUMBER_WORDS
+
+def embed(text: str, dim: int = 256) -> np.ndarray:
+    #Unit-length hashed content words, their character trigrams and word bigrams
+    # The bigrams make the vector order-sensitive: "Celsius to Fahrenheit" and
+    # "Fahrenheit to Celsius" share every word but none of their bigrams
+    vector = np.zeros(dim, dtype=np.float32)
+    words = content_words(text)
+    for word in words:
+        vector[_bucket(f"w:{word}", dim)] += 1.0
+        padded = f"<{word}>"
+        for i in range(len(padded) - 2):
+            vector[_bucket(padded[i:i + 3], dim)] += 0.5
+    for first, second in zip(words, words[1:]):
+        vector[_bucket(f"b:{first} {second}", dim)] += 1.5
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+class SemanticCache:
+    def __init__(self, max_entries: int = 10000, threshold: float = 0.85, dim: int = 256,
+                 path: Optional[str] = None, max_candidates: int = 1024, common_rows: int = 20,
+                 common_share: float = 0.01):
+        # Vectors live in one (max_entries, dim) float32 matrix, memory-mapped from path.npy
+        # when a path is given; questions, answers and recency go to path.json on save().
+        # A word index narrows each lookup to rows sharing a content word, then one
+        # batched dot product over those rows finds the best cosine match.
+        # A match above threshold is only a hit if the two questions differ in common words
+        # alone (in at least common_rows and common_share of the entries) and never in numbers
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.dim = dim
+        self.path = path
+        self.max_candidates = max_candidates
+        self.common_rows = common_rows
+        self.common_share = common_share
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._entries = [None] * max_entries  # row -> [namespace, question, answer]
+        self._last_used = np.zeros(max_entries, dtype=np.float64)
+        self._postings = {}  # (namespace, word) -> set of rows
+        self._free = list(range(max_entries - 1, -1, -1))
+        self._vectors = self._open_matrix()
+        if path:
+            self._load_entries()
+            atexit.register(self.save)
+
+    def _open_matrix(self):
+        shape = (self.max_entries, self.dim)
+        if not self.path:
+            return np.zeros(shape, dtype=np.float32)
+        matrix_path = f"{self.path}.npy"
+        if os.path.exists(matrix_path):
+            matrix = np.load(matrix_path, mmap_mode="r+")
+            if matrix.shape == shape and matrix.dtype == np.float32:
+                return matrix
+        return np.lib.format.open_memmap(matrix_path, mode="w+", dtype=np.float32, shape=shape)
+
+    def _load_entries(self):
+        meta_path = f"{self.path}.json"
+        if not os.path.exists(meta_path):
+            return
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+        except ValueError:
+            return
+        if meta.get("dim") != self.dim or len(meta.get("entries", [])) != self.max_entries:
+            return
+        for row, entry in enumerate(meta["entries"]):
+            # A row whose vector changed after the last save no longer matches its entry
+            if entry is not None and len(entry) == 5 and entry[4] == _checksum(self._vectors[row]):
+                namespace, question, answer, last_used, _ = entry
+                self._entries[row] = [namespace, question, answer]
+                self._last_used[row] = last_used
+                self._index(row, namespace, question)
+        self._free = [row for row in range(self.max_entries - 1, -1, -1) if self._entries[row] is None]
+
+    def _index(self, row: int, namespace: str, question: str):
+        for word in set(content_words(question)):
+            self._postings.setdefault((namespace, word), set()).add(row)
+
+    def _unindex(self, row: int, namespace: str, question: str):
+        for word in set(content_words(question)):
+            rows = self._postings.get((namespace, word))
+            if rows is not None:
+                rows.discard(row)
+                if not rows:
+                    del self._postings[(namespace, word)]
+
+    def _candidates(self, namespace: str, words: list) -> np.ndarray:
+        # Rarest words first, so the rows most likely to match are always included. A posting
+        # that would take the set past max_candidates is left out (a word that common says
+        # little about which row matches), unless it is the rarest one, which is then cut short
+        postings = sorted((self._postings.get((namespace, word), ()) for word in set(words)), key=len)
+        rows = set()
+        for posting in postings:
+            if len(rows) + len(posting) > self.max_candidates:
+                if not rows:
+                    rows.update(itertools.islice(posting, self.max_candidates))
+                break
+            rows.update(posting)
+        return np.fromiter(rows, dtype=np.int64, count=len(rows))
+
+    def _is_common(self, namespace: str, word: str) -> bool:
+        if is_number(word):
+            return False
+        rows = len(self._postings.get((namespace, word), ()))
+        size = self.max_entries - len(self._free)
+        return rows >= max(self.common_rows, self.common_share * size)
+
+    def _same_question(self, namespace: str, words: set, row: int) -> bool:
+        #True if the questions differ only in common words (a rare word or number must match)
+        stored = set(content_words(self._entries[row][1]))
+        return all(self._is_common(namespace, word) for word in words ^ stored)
+
+    def lookup(self, namespace: str, question: str, peek: bool = False) -> Optional[str]:
+        #Return the stored answer for the most similar earlier question, if similar enough
+        # peek=True only checks: no hit / miss is counted and recency is unchanged
+        if not self.max_entries:
+            return None
+        words = content_words(question)
+        query = embed(question, self.dim)
+        with self._lock:
+            rows = self._candidates(namespace, words) if words else None
+            if rows is None or not len(rows):
+                self.misses += not peek
+                return None
+            scores = self._vectors[rows] @ query
+            above = np.flatnonzero(scores >= self.threshold)
+            words = set(words)
+            for best in above[np.argsort(-scores[above])]:
+                row = int(rows[best])
+                if self._same_question(namespace, words, row):
+                    if not peek:
+                        self._last_used[row] = time.time()
+                        self.hits += 1
+                    return self._entries[row][2]
+            self.misses += not peek
+            return None
+
+    def put(self, namespace: str, question: str, answer: str):
+        #Store an answer, evicting the least recently used entry when full
+        if not self.max_entries or not content_words(question):
+            return
+        vector = embed(question, self.dim)
+        with self._lock:
+            if self._free:
+                row = self._free.pop()
+            else:
+                row = int(np.argmin(self._last_used))
+                self._unindex(row, *self._entries[row][:2])
+            self._vectors[row] = vector
+            self._entries[row] = [namespace, question, answer]
+            self._last_used[row] = time.time()
+            self._index(row, namespace, question)
+
+    def save(self):
+        #Flush the matrix and write the entry metadata (no-op without a path)
+        # Runs at exit; only the snapshot is taken under the lock, so lookups are not held up
+        if not self.path:
+            return
+        with self._lock:
+            self._vectors.flush()
+            entries = [None if entry is None else
+                       entry + [float(self._last_used[row]), _checksum(self._vectors[row])]
+                       for row, entry in enumerate(self._entries)]
+        with self._save_lock:
+            tmp = f"{self.path}.json.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"dim": self.dim, "entries": entries}, f, ensure_ascii=False)
+            os.replace(tmp, f"{self.path}.json")
+
+    def clear(self):
+        with self._lock:
+            self._entries = [None] * self.max_entries
+            self._last_used[:] = 0
+            self._postings.clear()
+            self._free = list(range(self.max_entries - 1, -1, -1))
+            self.hits = self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses,
+                    "hit_rate": self.hits / total if total else 0.0,
+                    "size": self.max_entries - len(self._free)}
+
+def _checksum(vector: np.ndarray) -> int:
+    return zlib.crc32(vector.tobytes())
+
+_shared = None
+_shared_lock = threading.Lock()
+
+def shared_semantic_cache() -> SemanticCache:
+    #Process-wide cache, created on first use from SEMANTIC_CACHE_SIZE / _THRESHOLD / _PATH
+    global _shared
+    if _shared is None:
+        with _shared_lock:
+            if _shared is None:
+                _shared = SemanticCache(
+                    max_entries=int(os.getenv("SEMANTIC_CACHE_SIZE", "10000")),
+                    threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.85")),
+                    path=os.getenv("SEMANTIC_CACHE_PATH"),
+                )
+    return _shared
@@ -0,0 +1,54 @@
+#Single Flight - coalesce identical in-flight calls so only one reaches the API
+
+import threading
+from concurrent.futures import Future
+
+class SingleFlight:
+    def __init__(self):
+        # calls: calls actually made; shared: callers served by another caller's call
+        self.calls = 0
+        self.shared = 0
+
+        self._lock = threading.Lock()
+        self._in_flight = {}  # key -> Future of the call currently running for it
+
+    def _claim(self, key):
+        #Return (future, True) for the caller that must run the call, (future, False) for waiters
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.shared += 1
+                return future, False
+            future = Future()
+            self._in_flight[key] = future
+            self.calls += 1
+            return future, True
+
+    def _settle(self, key, future: Future, result=None, error: BaseException = None):
+        # Drop the key first so callers arriving after completion start a fresh call
+        with self._lock:
+            self._in_flight.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key, fn):
+        #Run fn() once per key at a time; concurrent callers share its result or error
+        future, leader = self._claim(key)
+        if not leader:
+            return future.result()
+        try:
+            result = fn()
+        except BaseException as e:
+            self._settle(key, future, error=e)
+            raise
+        self._settle(key, future, result)
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"calls": self.calls, "shared": self.shared, "in_flight": len(self._in_flight)}
+
+# Process-wide coalescer used by llm.generate_text
+in_flight = SingleFlight()
@@ -0,0 +1,113 @@
+#Stub Backend - offline, deterministic stand-in for Gemini GenerativeModel
+
+import json
+import random
+import re
+import threading
+import time
+
+# Canned German translations for phrases used in the interaction logs and README
+TRANSLATIONS = {
+    "good morning": "Guten Morgen",
+    "have a nice day": "Schönen Tag noch",
+    "sunshine": "Sonnenschein",
+    "hello": "Hallo",
+    "thank you": "Danke",
+    "good night": "Gute Nacht",
+}
+
+def count_tokens(text: str) -> int:
+    # ~4 characters per token
+    return len(text) // 4 + 1 if text else 0
+
+class StubUsage:
+    def __init__(self, prompt: str, text: str, system_instruction: str = None, prefix_cached: bool = False):
+        # Same fields as Gemini's usage_metadata; the system instruction counts as prompt
+        # tokens and, once the prefix is cached, as cached_content tokens too
+        system_tokens = count_tokens(system_instruction)
+        self.prompt_token_count = count_tokens(prompt) + system_tokens
+        self.cached_content_token_count = system_tokens if prefix_cached else 0
+        self.candidates_token_count = count_tokens(text)
+        self.total_token_count = self.prompt_token_count + self.candidates_token_count
+
+class StubResponse:
+    def __init__(self, text: str, usage_metadata: StubUsage = None):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+class StubModel:
+    def __init__(self, model_name: str = "stub", latency: float = 0.0, jitter: float = 0.0,
+                 seed: int = 0, responses: dict = None, system_instruction: str = None):
+        # Same surface as GenerativeModel: model_name and generate_content(prompt, stream=False)
+        self.model_name = model_name
+        self.latency = latency
+        self.jitter = jitter
+        self.responses = responses or {}  # regex pattern -> canned reply
+        self.system_instruction = system_instruction
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt: str, stream: bool = False, **kwargs):
+        text = self.reply(prompt)
+        with self._lock:
+            # Stand-in for a provider prefix cache: the system instruction is cached after the first call
+            usage = StubUsage(prompt, text, self.system_instruction, prefix_cached=self.calls > 0)
+            self.calls += 1
+            self.prompt_tokens += usage.prompt_token_count
+            self.cached_tokens += usage.cached_content_token_count
+            delay = self.latency + self._random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+        if stream:
+            # Roughly word-sized chunks, like a streamed Gemini response; usage rides on the last one
+            chunks = [StubResponse(chunk) for chunk in re.findall(r"\S+\s*", text)]
+            if chunks:
+                chunks[-1].usage_metadata = usage
+            return chunks
+        return StubResponse(text, usage)
+
+    def reply(self, prompt: str) -> str:
+        #Return a deterministic canned reply for a prompt
+        for pattern, text in self.responses.items():
+            if re.search(pattern, prompt, re.IGNORECASE):
+                return text
+
+        array_match = re.search(r"(\[.*\])\s*$", prompt, re.DOTALL)
+        if "JSON array" in prompt and array_match:
+            items = json.loads(array_match.group(1))
+            return json.dumps([self.translate(item) for item in items], ensure_ascii=False)
+
+        object_match = re.search(r"(\{.*\})\s*$", prompt, re.DOTALL)
+        if "task id" in prompt and object_match:
+            # Fused multi-step prompt: {"1": {"type": ..., "text": ...}, ...}
+            tasks = json.loads(object_match.group(1))
+            return json.dumps({
+                task_id: self.translate(task["text"]) if task["type"] == "translate"
+                else f"This is a stub answer to '{task['text']}'."
+                for task_id, task in tasks.items()
+            }, ensure_ascii=False)
+
+        english = re.search(r"English:\s*(.+?)\s*German:", prompt, re.DOTALL)
+        if english:
+            return self.translate(english.group(1))
+        quoted = re.search(r"Translate '([^']+)' to German", prompt)
+        if quoted:
+            return self.translate(quoted.group(1))
+
+        if prompt.startswith("Calculate:"):
+            return "42"
+
+        question = prompt.rsplit("User:", 1)[-1].split(":", 1)[-1].strip()
+        return f"Step 1: Consider the question.\nFinal Answer: This is a stub answer to '{question}'."
+
+    def translate(self, text: str) -> str:
+        return TRANSLATIONS.get(text.strip().lower().rstrip(".!?"), f"[de] {text.strip()}")
+
+def stub_factory(latency: float = 0.0, jitter: float = 0.0, seed: int = 0):
+    #Return a model_registry backend that builds StubModels
+    return lambda model_name, **options: StubModel(model_name, latency=latency, jitter=jitter, seed=seed, **options)
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Tests import the flat top-level modules and never call the real API
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["LLM_BACKEND"] = "stub"
+os.environ.setdefault("TRANSLATION_MEMORY_PATH", ":memory:")
@@ -0,0 +1,97 @@
+import asyncio
+import io
+import json
+
+import pytest
+
+from agent_server import parse_request, serve_http, serve_stdio
+
+class EchoServer:
+    sessions = {}
+    max_in_flight = 4
+
+    async def process_query(self, query, session_id="default"):
+        return query.upper()
+
+    def history(self, session_id):
+        return []
+
+@pytest.mark.parametrize("data", [42, [], "hello", None, {}, {"query": 5}])
+def test_parse_request_rejects_malformed(data):
+    with pytest.raises(ValueError):
+        parse_request(data)
+
+def test_parse_request_defaults_session():
+    assert parse_request({"query": "hi"}) == ("hi", "default")
+    assert parse_request({"query": "hi", "session": 7}) == ("hi", "7")
+
+def post(body: bytes, max_body: int = 64) -> tuple:
+    #Send one POST /query to a fresh server and return (status code, JSON reply)
+    async def run():
+        started = asyncio.get_running_loop().create_future()
+        original = asyncio.start_server
+
+        async def start_server(handle, host, port):
+            # Listen on a free port and report it back to the client
+            server = await original(handle, host, 0)
+            started.set_result(server.sockets[0].getsockname()[1])
+            return server
+
+        asyncio.start_server = start_server
+        try:
+            task = asyncio.ensure_future(serve_http(EchoServer(), "127.0.0.1", 0, max_body))
+            port = await started
+        finally:
+            asyncio.start_server = original
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"POST /query HTTP/1.1\r\nContent-Length: %d\r\nConnection: close\r\n\r\n" % len(body) + body)
+        await writer.drain()
+        reply = await reader.read()
+        writer.close()
+        task.cancel()
+        head, _, payload = reply.partition(b"\r\n\r\n")
+        return int(head.split()[1]), json.loads(payload)
+    return asyncio.run(run())
+
+def test_http_query():
+    assert post(b'{"query": "hi"}') == (200, {"session": "default", "response": "HI"})
+
+@pytest.mark.parametrize("body", [b"42", b"[]", b'{"query": null}', b"not json"])
+def test_http_malformed_request_is_400(body):
+    status, reply = post(body)
+    assert status == 400 and "error" in reply
+
+def test_http_oversized_body_is_413():
+    status, reply = post(b'{"query": "' + b"x" * 100 + b'"}')
+    assert status == 413 and "error" in reply
+
+def test_stdio_errors_carry_the_request_id():
+    stdin = io.StringIO('{"id": 1, "query": "hi"}\n{"id": 4, "query": 5}\n[1]\nnot json\n')
+    stdout = io.StringIO()
+    asyncio.run(serve_stdio(EchoServer(), stdin, stdout))
+    replies = sorted((json.loads(line) for line in stdout.getvalue().splitlines()), key=str)
+    assert {"id": 1, "session": "default", "response": "HI"} in replies
+    assert {"id": 4, "error": "'query' must be a string"} in replies
+    assert sum("id" not in reply and "error" in reply for reply in replies) == 2
+
+def test_stdio_reads_ahead_at_most_max_in_flight_lines():
+    class SlowServer(EchoServer):
+        async def process_query(self, query, session_id="default"):
+            await asyncio.sleep(0.01)
+            return query
+
+    class Lines(io.StringIO):
+        read = 0
+
+        def readline(self):
+            line = super().readline()
+            if line:
+                self.read += 1
+                self.most_pending = max(getattr(self, "most_pending", 0), self.read - stdout.getvalue().count("\n"))
+            return line
+
+    stdin = Lines("".join(f'{{"id": {i}, "query": "q{i}"}}\n' for i in range(20)))
+    stdout = io.StringIO()
+    asyncio.run(serve_stdio(SlowServer(), stdin, stdout))
+    assert len(stdout.getvalue().splitlines()) == 20
+    assert stdin.most_pending <= SlowServer.max_in_flight
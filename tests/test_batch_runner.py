@@ -0,0 +1,77 @@
+import json
+
+import pytest
+
+import batch_runner
+from batch_runner import Checkpoint, read_queries, run_batch
+
+@pytest.fixture
+def echo(monkeypatch):
+    handled = []
+
+    def build_handler(level, log_path=None):
+        def handle(query):
+            handled.append(query)
+            return query.upper()
+        return None, handle
+
+    monkeypatch.setattr(batch_runner, "build_handler", build_handler)
+    return handled
+
+def write_lines(path, lines):
+    path.write_text("".join(line + "\n" for line in lines), encoding="utf-8")
+
+def results(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+def test_read_queries_formats(tmp_path):
+    source = tmp_path / "in.jsonl"
+    write_lines(source, ['{"id": "a", "query": "q1"}', '"q2"', "", "plain text", "42"])
+    assert list(read_queries(str(source))) == [
+        (0, "a", "q1"), (1, 1, "q2"), (2, None, None), (3, 3, "plain text"), (4, 4, 42)]
+
+def test_non_object_lines_become_error_records(tmp_path, echo):
+    source, output = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    write_lines(source, ['"q1"', "42", "[]", '{"query": 5}', '"q2"'])
+    summary = run_batch(str(source), str(output), concurrency=2, report_every=0)
+    assert summary["completed"] == 5 and summary["errors"] == 3
+    by_line = {record["line"]: record for record in results(output)}
+    assert by_line[0]["response"] == "Q1" and by_line[4]["response"] == "Q2"
+    assert all("error" in by_line[line] for line in (1, 2, 3))
+
+def test_resume_skips_finished_lines(tmp_path, echo):
+    source, output = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    write_lines(source, [f'"q{i}"' for i in range(10)])
+    run_batch(str(source), str(output), concurrency=1, checkpoint_every=1, report_every=0)
+    echo.clear()
+
+    summary = run_batch(str(source), str(output), concurrency=1, report_every=0)
+    assert echo == []
+    assert summary["completed"] == 10 and summary["resumed"] == 10
+
+def test_checkpoint_load_recounts_and_drops_torn_line(tmp_path):
+    output = tmp_path / "out.jsonl"
+    lines = [json.dumps({"line": n, "response": "ok"}) for n in (0, 1, 3)]
+    output.write_text("\n".join(lines) + '\n{"line": 4, "resp', encoding="utf-8")
+    checkpoint = Checkpoint(str(tmp_path / "out.jsonl.ckpt"))
+    checkpoint.next_line = 1
+    checkpoint.save()
+
+    checkpoint = Checkpoint(checkpoint.path)
+    checkpoint.load(str(output))
+    assert checkpoint.completed == 3
+    assert checkpoint.next_line == 2 and checkpoint.done == {3}
+    assert output.read_text(encoding="utf-8").endswith('"ok"}\n')
+
+def test_resume_after_crash_processes_only_missing_lines(tmp_path, echo):
+    source, output = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    write_lines(source, [f'"q{i}"' for i in range(6)])
+    # A crashed run: lines 0, 1 and 3 written, checkpoint at line 1, half a line at the end
+    output.write_text("".join(json.dumps({"line": n, "query": f"q{n}", "response": f"Q{n}"}) + "\n"
+                              for n in (0, 1, 3)) + '{"line": 2', encoding="utf-8")
+    (tmp_path / "out.jsonl.ckpt").write_text('{"next_line": 1}', encoding="utf-8")
+
+    summary = run_batch(str(source), str(output), concurrency=1, report_every=0)
+    assert sorted(echo) == ["q2", "q4", "q5"]
+    assert summary["completed"] == 6
+    assert sorted(record["line"] for record in results(output)) == list(range(6))
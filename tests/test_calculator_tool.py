@@ -0,0 +1,80 @@
+from decimal import Decimal
+from fractions import Fraction
+
+import pytest
+
+from calculator_tool import CalculatorTool, parse_expression
+
+@pytest.fixture
+def calculator():
+    return CalculatorTool()
+
+@pytest.mark.parametrize("expression, result", [
+    ("add 5 and 3", 8),
+    ("5 + 3", 8),
+    ("What is 12 times 7?", 84),
+    ("add 1, 2 and 3", 6),
+    ("subtract 3 from 10", 7),
+    ("divide 10 by 4", 2.5),
+    ("2 + 3 * 4", 14),
+    ("(2 + 3) * 4", 20),
+    ("2 ^ 3 ^ 2", 512),
+    ("-2 ^ 2", -4),
+    ("-2 * 3", -6),
+    ("3 squared plus 4 squared", 25),
+    ("what is the sum of 2 and 3", 5),
+    ("10 mod 3", 1),
+    ("calculate 15% of 200", 30),
+    ("5 percent of 80", 4),
+    ("200 + 10%", 220),
+    ("200 - 10%", 180),
+])
+def test_expressions(calculator, expression, result):
+    outcome = calculator.calculate(expression)
+    assert outcome["success"], outcome
+    assert outcome["result"] == pytest.approx(result)
+
+def test_percentage_operation_name(calculator):
+    assert calculator.calculate("15% of 200")["operation"] == "percentage"
+
+@pytest.mark.parametrize("expression", [
+    "add 2 and 3 to the result",
+    "area of 5",
+    "2 of 3",
+    "10 % 3",
+    "5 +",
+    "(1 + 2",
+    "7",
+])
+def test_rejected_expressions(calculator, expression):
+    assert not calculator.calculate(expression)["success"]
+
+def test_division_by_zero(calculator):
+    assert calculator.calculate("1 / 0") == {"success": False, "error": "Division by zero"}
+
+def test_exact_modes():
+    assert CalculatorTool("decimal").calculate("0.1 + 0.2")["result"] == Decimal("0.3")
+    assert CalculatorTool("fraction").calculate("1 / 3 + 1 / 6")["result"] == Fraction(1, 2)
+
+def test_deep_nesting_is_an_error():
+    tree, error = parse_expression("(" * 5000 + "1" + ")" * 5000)
+    assert tree is None and error
+
+def test_calculate_many_copies_results(calculator):
+    first, second = calculator.calculate_many(["2 + 2", "2 + 2"])
+    first["result"] = 0
+    assert second["result"] == 4
+
+def test_long_flat_expression(calculator):
+    result = calculator.calculate(" + ".join(["1"] * 1200))
+    assert result["success"] and result["result"] == 1200
+
+def test_long_flat_expression_in_level2(tmp_path):
+    from chatbot_with_tool import ChatbotWithTool
+    bot = ChatbotWithTool(log_path=str(tmp_path / "log.jsonl"))
+    assert "1200" in bot.process_query(" + ".join(["1"] * 1200))
+
+@pytest.mark.parametrize("mode", ["float", "decimal", "fraction"])
+def test_nested_powers_are_bounded(mode):
+    result = CalculatorTool(mode).calculate("((10^999)^999)^999")
+    assert not result["success"]
@@ -0,0 +1,83 @@
+import pytest
+
+import model_registry
+from response_cache import shared_cache
+from stub_backend import StubModel
+
+@pytest.fixture
+def prompts():
+    # (model name, system instruction, prompt) for every call the agent makes
+    calls = []
+
+    class RecordingModel(StubModel):
+        def generate_content(self, prompt, stream=False, **kwargs):
+            calls.append((self.model_name, self.system_instruction, prompt))
+            return super().generate_content(prompt, stream=stream, **kwargs)
+
+    model_registry.set_backend(lambda name, **options: RecordingModel(name, **options))
+    shared_cache.clear()
+    yield calls
+    model_registry.set_backend(None)
+
+@pytest.fixture
+def agent(tmp_path, prompts):
+    from full_agent import FullAgent
+    from semantic_cache import SemanticCache
+    from translation_memory import TranslationMemory
+    agent = FullAgent(log_path=str(tmp_path / "log.jsonl"))
+    agent.answers = SemanticCache(max_entries=10)
+    agent.translator.memory = TranslationMemory()
+    return agent
+
+def test_fused_call_has_no_agent_system_prompt(agent, prompts):
+    agent.process_query("Explain why the sky is blue, then translate 'Good night' into German")
+    fused = [call for call in prompts if "task id" in call[2]]
+    assert len(fused) == 1
+    assert fused[0][1] is None
+
+def test_parsed_fallbacks_have_no_agent_system_prompt(agent, prompts):
+    agent.process_step("Add 5 and 3 apples")
+    fallbacks = [call for call in prompts if "Give only the numeric result" in call[2]]
+    assert len(fallbacks) == 1 and fallbacks[0][1] is None
+
+def test_knowledge_steps_keep_the_system_prompt(agent, prompts):
+    agent.process_step("Why is the sky blue?")
+    assert prompts[0][1] == agent.system_prompt
+
+def test_each_lookup_is_counted_once(agent):
+    agent.process_query("What is the capital of France, then translate 'Good night' into German")
+    assert agent.facts.stats()["hits"] >= 1
+    facts = agent.facts.stats()
+    memory = agent.translator.memory.stats()
+    misses = shared_cache.stats()["misses"]
+
+    agent.process_query("What is the capital of Spain, then translate 'Sleep well' into German")
+    assert agent.facts.stats()["hits"] - facts["hits"] == 1
+    assert agent.translator.memory.stats()["misses"] - memory["misses"] == 1
+    assert shared_cache.stats()["misses"] - misses == 1
+
+def test_untiered_agent_does_not_hedge_against_itself(tmp_path, prompts):
+    from full_agent import FullAgent
+    from semantic_cache import SemanticCache
+    agent = FullAgent(log_path=str(tmp_path / "log.jsonl"), tiered=False)
+    agent.answers = SemanticCache(max_entries=10)
+    agent.process_step("Why is the sky blue?")
+    assert agent.hedger.stats()["delays"] == {}
+    assert len(prompts) == 1
+
+@pytest.mark.parametrize("query", [
+    "Tell me about World War 2 from 1939-1945",
+    "What does 24/7 support mean?",
+    "What is a 3x3 matrix?",
+    "What happened in 2020-2021?",
+])
+def test_questions_with_numbers_get_knowledge_answers(agent, prompts, query):
+    response = agent.process_query(query)
+    assert "calculate" not in response.lower()
+    assert not any("Give only the numeric result" in prompt for _, _, prompt in prompts)
+
+@pytest.mark.parametrize("query, result", [("2 to the power of 10", "1024"), ("3 squared", "9")])
+def test_power_phrases_are_calculated_locally(agent, prompts, query, result):
+    response = agent.process_query(query)
+    assert f"Calculated exponentiation: {result}" in response
+    assert prompts == []
@@ -0,0 +1,97 @@
+import itertools
+import time
+
+import pytest
+
+from hedging import Hedger
+from llm import generate_text
+from stub_backend import StubModel
+
+_names = itertools.count()
+
+def model(latency=0.0, reply="primary"):
+    # Unique names: a slow call left running by one test must not coalesce with the next test's
+    return StubModel(f"{reply}-{next(_names)}", latency=latency, responses={".": reply})
+
+def answer(model):
+    # Uncached, so every call reaches the stub and pays its latency
+    return lambda: generate_text(model, "Answer this question concisely: Why is the sky blue?", cache=None)
+
+def slow(latency):
+    return model(latency, "slow answer")
+
+def fast():
+    return model(reply="fast answer")
+
+class FailingModel(StubModel):
+    def generate_content(self, prompt, stream=False, **kwargs):
+        self.calls += 1
+        raise ValueError("bad request")
+
+def test_fast_primary_is_not_hedged():
+    hedger, backup = Hedger(default_delay=1.0), fast()
+    assert hedger.run("k", answer(model()), answer(backup)) == "primary"
+    assert backup.calls == 0 and hedger.stats()["hedged"] == 0
+
+def test_slow_primary_loses_to_the_backup():
+    hedger = Hedger(default_delay=0.02)
+    start = time.perf_counter()
+    assert hedger.run("k", answer(slow(0.5)), answer(fast())) == "fast answer"
+    assert time.perf_counter() - start < 0.4
+    assert hedger.stats()["hedged"] == 1 and hedger.stats()["fallback_wins"] == 1
+
+def test_first_result_wins_when_the_primary_finishes_first():
+    hedger, backup = Hedger(default_delay=0.02), slow(0.5)
+    start = time.perf_counter()
+    assert hedger.run("k", answer(model(0.1)),
+                      answer(backup)) == "primary"
+    assert time.perf_counter() - start < 0.4
+    assert backup.calls == 1
+    assert hedger.stats()["hedged"] == 1 and hedger.stats()["fallback_wins"] == 0
+
+def test_queued_loser_is_cancelled():
+    # One worker: the hedge queues behind the primary and must never start once it has lost
+    hedger, backup = Hedger(default_delay=0.02, max_workers=1), fast()
+    assert hedger.run("k", answer(model(0.1)),
+                      answer(backup)) == "primary"
+    hedger._pool.shutdown(wait=True)
+    assert backup.calls == 0
+
+def test_failed_primary_falls_back_without_waiting():
+    hedger, primary = Hedger(default_delay=1.0), FailingModel("primary")
+    start = time.perf_counter()
+    assert hedger.run("k", answer(primary), answer(fast())) == "fast answer"
+    assert time.perf_counter() - start < 0.5
+    assert primary.calls == 1 and hedger.stats()["hedged"] == 0
+
+def test_none_result_falls_back():
+    hedger = Hedger(default_delay=1.0)
+    assert hedger.run("k", lambda: None, answer(fast())) == "fast answer"
+
+def test_both_failing_raises_the_fallback_error():
+    hedger = Hedger(default_delay=0.02)
+
+    def primary():
+        time.sleep(0.1)
+        raise RuntimeError("primary")
+
+    def fallback():
+        raise ValueError("fallback")
+    with pytest.raises(ValueError, match="fallback"):
+        hedger.run("k", primary, fallback)
+
+def test_delay_follows_the_latency_percentile():
+    hedger = Hedger(percentile=95, default_delay=2.0, min_delay=0.05, min_samples=20)
+    for i in range(19):
+        hedger.observe("k", (i + 1) / 100)
+    assert hedger.delay("k") == 2.0
+    hedger.observe("k", 0.20)
+    assert hedger.delay("k") == pytest.approx(0.20)
+    for _ in range(200):
+        hedger.observe("fast", 0.001)
+    assert hedger.delay("fast") == 0.05
+
+def test_primary_latency_is_recorded():
+    hedger = Hedger(default_delay=1.0, min_samples=1, min_delay=0)
+    hedger.run("k", answer(model(0.05)), answer(fast()))
+    assert 0.04 < hedger.delay("k") < 0.5
@@ -0,0 +1,65 @@
+import os
+
+from interaction_log import InteractionLog
+from interaction_store import InteractionStore
+
+def crash(log):
+    # Drop the lines a background flusher had not written yet, as a killed process would
+    with log._lock:
+        log._pending.clear()
+        log._written.clear()
+    log._stop.set()
+
+def test_offsets_are_indexed_only_after_the_log_write(tmp_path):
+    log = InteractionLog(str(tmp_path / "log.jsonl"), flush_interval=3600)
+    store = InteractionStore(log, index_path=str(tmp_path / "log.idx"), ring_size=2)
+    store.add("q1", "r1")
+    assert not os.path.exists(store.index_path)
+    log.flush()
+    assert os.path.getsize(store.index_path) == 8
+
+def test_crash_with_pending_lines_keeps_the_index_consistent(tmp_path):
+    log_path, index_path = str(tmp_path / "log.jsonl"), str(tmp_path / "log.idx")
+    log = InteractionLog(log_path, flush_interval=3600)
+    store = InteractionStore(log, index_path=index_path, ring_size=1)
+    store.add("q1", "r1")
+    log.flush()
+    store.add("lost", "never written")
+    crash(log)
+
+    log = InteractionLog(log_path)
+    store = InteractionStore(log, index_path=index_path, ring_size=1)
+    store.add("q2", "r2")
+    store.add("q3", "r3")
+    assert [turn.query for turn in store.page(0, 10)] == ["q1", "q2", "q3"]
+
+def test_history_pages_past_the_ring(tmp_path):
+    log = InteractionLog(str(tmp_path / "log.jsonl"))
+    store = InteractionStore(log, index_path=str(tmp_path / "log.idx"), ring_size=2)
+    for i in range(5):
+        store.add(f"q{i}", f"r{i}")
+    reopened = InteractionStore(log, index_path=store.index_path, ring_size=2)
+    reopened.load()
+    assert len(reopened) == 5
+    assert [turn.query for turn in reopened.page(1, 3)] == ["q1", "q2", "q3"]
+    assert [turn.query for turn in reopened.recent] == ["q3", "q4"]
+
+def test_discard_removes_the_index_for_good(tmp_path):
+    log = InteractionLog(str(tmp_path / "log.jsonl"), flush_interval=3600)
+    store = InteractionStore(log, index_path=str(tmp_path / "s.idx"), session="s")
+    store.add("q1", "r1")
+    log.flush()
+    store.add("q2", "r2")
+    store.discard()
+    log.flush()
+    assert not os.path.exists(store.index_path)
+
+def test_sessions_do_not_hold_index_files_open(tmp_path):
+    log = InteractionLog(str(tmp_path / "log.jsonl"))
+    before = len(os.listdir("/proc/self/fd")) if os.path.isdir("/proc/self/fd") else None
+    stores = [InteractionStore(log, index_path=str(tmp_path / f"{i}.idx"), session=str(i)) for i in range(50)]
+    for store in stores:
+        store.add("q", "r")
+    assert all(os.path.getsize(store.index_path) == 8 for store in stores)
+    if before is not None:
+        assert len(os.listdir("/proc/self/fd")) <= before + 1
@@ -0,0 +1,42 @@
+import pytest
+
+from query_router import route
+
+def test_multi_step_plan():
+    plan = route("Add 10 and 20, then translate 'Have a nice day' into German.")
+    assert plan.multi_step
+    assert [step.tool for step in plan.steps] == ["calculate", "translate"]
+    assert plan.steps[1].argument == "Have a nice day"
+
+def test_single_knowledge_step():
+    plan = route("What is the capital of France?")
+    assert not plan.multi_step
+    assert [step.tool for step in plan.steps] == ["knowledge"]
+
+def test_level2_mixed_tasks():
+    assert route("Multiply 9 and 8, and also tell me the capital of Japan.").mixed_tasks
+    assert not route("What is 12 times 7?").mixed_tasks
+
+@pytest.mark.parametrize("query", [
+    "Tell me about World War 2 (1939-1945)",
+    "What is a 3x3 matrix?",
+    "What does 24/7 support mean?",
+])
+def test_level1_sends_questions_with_numbers_to_the_llm(tmp_path, query):
+    from chatbot import SmartChatbot
+    bot = SmartChatbot(log_path=str(tmp_path / "log.jsonl"))
+    assert "I cannot perform calculations" not in bot.get_response(query)
+    assert query in bot.get_response(query)
+
+@pytest.mark.parametrize("query", [
+    "Tell me about World War 2 from 1939-1945",
+    "What does 24/7 support mean?",
+    "What is a 3x3 matrix?",
+    "What happened in 2020-2021?",
+])
+def test_numbers_in_questions_are_not_calculations(query):
+    assert [step.tool for step in route(query).steps] == ["knowledge"]
+
+@pytest.mark.parametrize("query", ["2 to the power of 10", "3 squared", "What is 12 times 7?", "Add 2 and 2"])
+def test_expressions_go_to_the_calculator(query):
+    assert [step.tool for step in route(query).steps] == ["calculate"]
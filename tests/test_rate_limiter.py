@@ -0,0 +1,122 @@
+import threading
+
+import pytest
+
+import rate_limiter
+from rate_limiter import RateLimiter, RateLimitTimeout
+
+class FakeClock:
+    #Stands in for the time module: sleeping and waiting only move the clock forward
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+class FakeCondition(type(threading.Condition())):
+    def __init__(self, clock):
+        super().__init__()
+        self.clock = clock
+
+    def wait(self, timeout=None):
+        self.clock.now += timeout
+        return False
+
+class MaxJitter:
+    #Always picks the top of the full-jitter range and records it
+    def __init__(self):
+        self.ranges = []
+
+    def uniform(self, low, high):
+        self.ranges.append((low, high))
+        return high
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter, "time", clock)
+    return clock
+
+def limiter(clock, **options):
+    limiter = RateLimiter(**options)
+    limiter._cond = FakeCondition(clock)
+    limiter._random = MaxJitter()
+    return limiter
+
+def failing(times, error):
+    calls = []
+
+    def fn():
+        calls.append(1)
+        if len(calls) <= times:
+            raise error
+        return "ok"
+    return fn, calls
+
+def test_throttling_halves_the_limit_and_retries(clock):
+    limit = limiter(clock, max_concurrency=16, base_delay=0.5)
+    fn, calls = failing(2, Exception("429 quota exceeded"))
+    assert limit.call(fn) == "ok"
+    assert len(calls) == 3
+    # 16 -> 8 -> 4 on the two throttles, then +1/4 for the success
+    assert limit.stats() == {"limit": 4.25, "in_flight": 0, "throttled": 2, "retries": 2}
+    assert limit._random.ranges == [(0, 0.5), (0, 1.0)]
+    assert clock.sleeps == [0.5, 1.0]
+
+def test_limit_never_drops_below_the_minimum(clock):
+    limit = limiter(clock, max_concurrency=4, min_concurrency=2, max_retries=10, base_delay=0.01)
+    fn, _ = failing(5, Exception("429"))
+    limit.call(fn)
+    assert limit.stats()["limit"] == 2.5
+
+def test_backoff_is_capped_at_max_delay(clock):
+    limit = limiter(clock, base_delay=1, max_delay=3, max_retries=4, deadline=None)
+    fn, _ = failing(4, Exception("503 unavailable"))
+    limit.call(fn)
+    assert clock.sleeps == [1, 2, 3, 3]
+
+def test_retries_give_up_after_max_retries(clock):
+    limit = limiter(clock, max_retries=3, base_delay=0.01)
+    error = Exception("503 service unavailable")
+    fn, calls = failing(100, error)
+    with pytest.raises(Exception) as raised:
+        limit.call(fn)
+    assert raised.value is error
+    assert len(calls) == 4
+    assert limit.stats()["retries"] == 3 and limit.stats()["throttled"] == 0
+
+def test_other_errors_are_not_retried(clock):
+    limit = limiter(clock)
+    fn, calls = failing(1, ValueError("bad prompt"))
+    with pytest.raises(ValueError):
+        limit.call(fn)
+    assert len(calls) == 1 and clock.sleeps == []
+
+def test_retry_past_the_deadline_re_raises(clock):
+    limit = limiter(clock, base_delay=10, deadline=5)
+    error = Exception("429")
+    fn, calls = failing(1, error)
+    with pytest.raises(Exception) as raised:
+        limit.call(fn)
+    assert raised.value is error and len(calls) == 1 and clock.sleeps == []
+
+def test_waiting_for_quota_times_out_at_the_deadline(clock):
+    limit = limiter(clock, rpm=1, deadline=5)
+    assert limit.call(lambda: "first") == "first"
+    start = clock.now
+    with pytest.raises(RateLimitTimeout):
+        limit.call(lambda: "second")
+    assert clock.now - start == pytest.approx(5)
+    assert limit.stats()["in_flight"] == 0
+
+def test_quota_wait_without_deadline_refills_the_bucket(clock):
+    limit = limiter(clock, rpm=1, deadline=None)
+    limit.call(lambda: "first")
+    start = clock.now
+    assert limit.call(lambda: "second") == "second"
+    assert clock.now - start == pytest.approx(60)
@@ -0,0 +1,8 @@
+from response_cache import ResponseCache
+
+def test_key_ignores_whitespace_but_keeps_case():
+    cache = ResponseCache()
+    cache.put("model", "Translate 'Polish'  into German", "Polnisch")
+    assert cache.get("model", " Translate 'Polish' into\nGerman") == "Polnisch"
+    assert cache.get("model", "Translate 'polish' into German") is None
+    assert cache.get("other", "Translate 'Polish' into German") is None
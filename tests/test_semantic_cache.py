@@ -0,0 +1,90 @@
+import time
+
+import pytest
+
+from semantic_cache import SemanticCache
+
+@pytest.fixture
+def cache():
+    cache = SemanticCache(max_entries=100)
+    cache.put("k", "How do I convert Celsius to Fahrenheit", "celsius-to-fahrenheit")
+    cache.put("k", "Who was the first president of the United States of America and when was he elected",
+              "first-president")
+    cache.put("k", "What is the capital of France?", "paris")
+    return cache
+
+def test_rephrased_question_hits(cache):
+    assert cache.lookup("k", "Tell me the capital of France please") == "paris"
+    assert cache.lookup("k", "how do i convert celsius to fahrenheit?") == "celsius-to-fahrenheit"
+
+def test_word_order_matters(cache):
+    assert cache.lookup("k", "How do I convert Fahrenheit to Celsius") is None
+
+def test_rare_words_must_match(cache):
+    assert cache.lookup("k", "Who was the second president of the United States of America "
+                             "and when was he elected") is None
+
+def test_numbers_must_match():
+    cache = SemanticCache(max_entries=10)
+    cache.put("k", "What is 15 percent of 200", "30")
+    assert cache.lookup("k", "What is 15 percent of 300") is None
+    assert cache.lookup("k", "what is 15 percent of 200?") == "30"
+
+def test_namespaces_are_separate(cache):
+    assert cache.lookup("other", "What is the capital of France?") is None
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SemanticCache(max_entries=2)
+    cache.put("k", "capital of France", "paris")
+    cache.put("k", "capital of Spain", "madrid")
+    cache.lookup("k", "capital of France")
+    cache.put("k", "capital of Italy", "rome")
+    assert cache.lookup("k", "capital of Spain") is None
+    assert cache.lookup("k", "capital of France") == "paris"
+    assert cache.stats()["size"] == 2
+
+def test_entries_persist_after_save(tmp_path):
+    path = str(tmp_path / "answers")
+    cache = SemanticCache(max_entries=10, path=path)
+    cache.put("k", "Who wrote Hamlet", "Shakespeare")
+    cache.save()
+    assert SemanticCache(max_entries=10, path=path).lookup("k", "who wrote hamlet?") == "Shakespeare"
+
+def test_unsaved_rows_are_not_served_after_restart(tmp_path):
+    path = str(tmp_path / "answers")
+    cache = SemanticCache(max_entries=1, path=path)
+    cache.put("k", "Who wrote Hamlet", "Shakespeare")
+    cache.save()
+    # Overwrites the only row's vector without saving its new entry
+    cache.put("k", "Who painted the Mona Lisa", "Leonardo")
+    reopened = SemanticCache(max_entries=1, path=path)
+    assert reopened.lookup("k", "Who wrote Hamlet") is None
+    assert reopened.lookup("k", "Who painted the Mona Lisa") is None
+
+def test_full_agent_does_not_reuse_reversed_conversion(tmp_path):
+    from full_agent import FullAgent
+    agent = FullAgent(log_path=str(tmp_path / "log.jsonl"))
+    agent.answers = SemanticCache(max_entries=10)
+    first = agent.process_query("How do I convert Celsius to Fahrenheit")
+    second = agent.process_query("How do I convert Fahrenheit to Celsius")
+    assert "Celsius to Fahrenheit'" in first
+    assert "Fahrenheit to Celsius'" in second
+
+def test_lookup_latency_at_100k_entries():
+    # "population" is in every row, so without the candidate cap each lookup would score them all
+    cache = SemanticCache(max_entries=100_000)
+    for i in range(100_000):
+        cache.put("knowledge", f"population t{i} r{i % 300}", f"a{i}")
+
+    def median_ms(question):
+        times = []
+        for i in range(101):
+            start = time.perf_counter()
+            cache.lookup("knowledge", question.format(i=i))
+            times.append(time.perf_counter() - start)
+        return sorted(times)[50] * 1000
+
+    assert cache.lookup("knowledge", "population t42 r42") == "a42"
+    assert median_ms("population t{i} r{i}") < 1
+    assert median_ms("population") < 1
+    assert median_ms("population r{i}") < 1
@@ -0,0 +1,51 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from single_flight import SingleFlight
+
+def run_together(flight, fn, callers=5):
+    #Start callers threads on one key while the first call is held open; return their outcomes
+    release = threading.Event()
+
+    def held():
+        release.wait(5)
+        return fn()
+
+    with ThreadPoolExecutor(callers) as pool:
+        futures = [pool.submit(flight.do, "key", held) for _ in range(callers)]
+        while flight.stats()["shared"] < callers - 1:
+            threading.Event().wait(0.001)
+        release.set()
+        outcomes = []
+        for future in futures:
+            try:
+                outcomes.append(future.result())
+            except Exception as e:
+                outcomes.append(e)
+    return outcomes
+
+def test_concurrent_identical_calls_run_once():
+    flight = SingleFlight()
+    calls = []
+    outcomes = run_together(flight, lambda: calls.append(1) or "answer")
+    assert calls == [1]
+    assert outcomes == ["answer"] * 5
+    assert flight.stats() == {"calls": 1, "shared": 4, "in_flight": 0}
+
+def test_error_reaches_every_waiter():
+    flight = SingleFlight()
+    error = RuntimeError("quota")
+
+    def fail():
+        raise error
+    assert run_together(flight, fail) == [error] * 5
+
+def test_later_calls_start_fresh():
+    flight = SingleFlight()
+    assert flight.do("key", lambda: 1) == 1
+    with pytest.raises(ValueError):
+        flight.do("key", lambda: int("x"))
+    assert flight.do("key", lambda: 2) == 2
+    assert flight.stats()["calls"] == 3
@@ -0,0 +1,37 @@
+from translation_memory import TranslationMemory
+
+def memory(threshold=0.9):
+    memory = TranslationMemory(threshold=threshold)
+    memory.add("Your order will arrive in 3 days", "Ihre Bestellung kommt in 3 Tagen an")
+    memory.add("Please do not close the application window", "Bitte schließen Sie das Anwendungsfenster nicht")
+    memory.add("The weather is lovely today and the sun is shining", "Das Wetter ist heute schön und die Sonne scheint")
+    return memory
+
+def test_exact_match_ignores_spacing():
+    assert memory().lookup("Your  order will arrive in 3 days ") == ("Ihre Bestellung kommt in 3 Tagen an", 1.0)
+
+def test_case_distinct_words_never_match():
+    memory = TranslationMemory(threshold=0.9)
+    memory.add("Polish", "Polnisch")
+    memory.add("turkey", "Truthahn")
+    assert memory.lookup("polish") is None
+    assert memory.lookup("Turkey") is None
+    assert memory.lookup("Polish") == ("Polnisch", 1.0)
+
+def test_fuzzy_match_for_punctuation_and_small_edits():
+    target, similarity = memory().lookup("The weather is lovely today, and the sun is shining!")
+    assert target == "Das Wetter ist heute schön und die Sonne scheint"
+    assert 0.9 <= similarity <= 1.0
+
+def test_different_numbers_never_match():
+    # 0.909 Dice similarity, above the threshold
+    assert memory().lookup("Your order will arrive in 5 days") is None
+
+def test_different_negation_never_matches():
+    # 0.925 Dice similarity, above the threshold
+    assert memory().lookup("Please do close the application window") is None
+    assert memory().lookup("Please don't close the application window") is None
+
+def test_default_threshold_is_strict():
+    assert TranslationMemory().threshold == 0.95
+    assert memory(TranslationMemory().threshold).lookup("The weather is lovely today and the sun was shining") is None
@@ -0,0 +1,80 @@
+import pytest
+
+import model_registry
+from response_cache import shared_cache
+from stub_backend import StubModel
+from translation_memory import TranslationMemory
+
+def translator(batch_reply=None):
+    #A translator on a fresh memory whose model records every prompt; batch_reply overrides JSON-array replies
+    from translator_tool import TranslatorTool
+    prompts = []
+    responses = {"JSON array": batch_reply} if batch_reply is not None else None
+
+    class RecordingModel(StubModel):
+        def generate_content(self, prompt, stream=False, **kwargs):
+            prompts.append(prompt)
+            return super().generate_content(prompt, stream=stream, **kwargs)
+
+    model_registry.set_backend(lambda name, **options: RecordingModel(name, responses=responses, **options))
+    tool = TranslatorTool(memory=TranslationMemory())
+    return tool, prompts
+
+@pytest.fixture(autouse=True)
+def fresh_backend():
+    shared_cache.clear()
+    yield
+    model_registry.set_backend(None)
+
+def batches(prompts):
+    return [prompt for prompt in prompts if "JSON array" in prompt]
+
+def test_duplicates_are_translated_once():
+    tool, prompts = translator()
+    results = tool.translate_many(["Hello", "Thank you", "Hello", " "])
+    assert len(prompts) == 1 and len(batches(prompts)) == 1
+    assert prompts[0].count('"Hello"') == 1
+    assert [result.get("translation") for result in results] == ["Hallo", "Danke", "Hallo", None]
+    assert not results[3]["success"]
+
+def test_batches_stay_under_the_token_budget():
+    tool, prompts = translator()
+    texts = [f"Sentence number {i} for the batch" for i in range(6)]  # 15 estimated tokens each
+    assert [len(batch) for batch in tool.make_batches(texts, 40)] == [2, 2, 2]
+    results = tool.translate_many(texts, max_batch_tokens=40)
+    assert len(batches(prompts)) == 3 and len(prompts) == 3
+    assert [result["translation"] for result in results] == [f"[de] {text}" for text in texts]
+
+def test_oversized_text_gets_its_own_batch():
+    tool, _ = translator()
+    assert tool.make_batches(["a" * 400, "b", "c"], 40) == [["a" * 400], ["b", "c"]]
+
+def test_memory_and_cached_translations_skip_the_model():
+    tool, prompts = translator()
+    tool.memory.add("Good morning", "Guten Morgen")
+    tool.translate("Good night")
+    prompts.clear()
+    results = tool.translate_many(["Good morning", "Good night", "Hello"])
+    assert len(prompts) == 1 and "Good morning" not in prompts[0] and "Good night" not in prompts[0]
+    assert [result["translation"] for result in results] == ["Guten Morgen", "Gute Nacht", "Hallo"]
+
+def test_batch_results_seed_the_memory_and_cache():
+    tool, prompts = translator()
+    tool.translate_many(["Hello", "Thank you"])
+    prompts.clear()
+    assert tool.translate("Hello", use_memory=False)["translation"] == "Hallo"
+    assert tool.memory.lookup("Thank you") == ("Danke", 1.0)
+    assert prompts == []
+
+@pytest.mark.parametrize("reply", ['["Hallo"]', "not json", '{"0": "Hallo"}'])
+def test_misaligned_or_invalid_batch_reply_is_retried_one_by_one(reply):
+    tool, prompts = translator(reply)
+    results = tool.translate_many(["Hello", "Thank you", "Good night"])
+    assert len(batches(prompts)) == 1 and len(prompts) == 4
+    assert [result["translation"] for result in results] == ["Hallo", "Danke", "Gute Nacht"]
+
+def test_empty_batch_answer_is_retried_alone():
+    tool, prompts = translator('["Hallo", " ", "Gute Nacht"]')
+    results = tool.translate_many(["Hello", "Thank you", "Good night"])
+    assert len(prompts) == 2 and "English: Thank you" in prompts[1]
+    assert [result["translation"] for result in results] == ["Hallo", "Danke", "Gute Nacht"]
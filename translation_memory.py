@@ -0,0 +1,168 @@
+#Translation Memory - persistent English->German segments with exact and trigram fuzzy lookup
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)*")
+_WORD = re.compile(r"\w+")
+_NEGATION = re.compile(r"\b(?:not|no|never|nothing|none|nobody|nowhere|neither|nor|without|cannot|\w+n't)\b")
+
+def normalize(text: str) -> str:
+    # Case is kept: "Polish" and "polish", "Turkey" and "turkey" translate differently
+    return re.sub(r"\s+", " ", text).strip()
+
+def trigrams(text: str) -> set:
+    #Casefolded character trigrams without punctuation, padded so short strings have some
+    padded = f"  {_PUNCTUATION.sub('', normalize(text).casefold())} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def key_tokens(text: str) -> tuple:
+    #Numbers, negations and capitalized words of a text; a fuzzy match must have exactly the same ones
+    text = normalize(text).replace("\u2019", "'")
+    cased = sorted(word for word in _WORD.findall(text) if not word.islower() and word.casefold() != word)
+    folded = text.casefold()
+    return _NUMBER.findall(folded), sorted(_NEGATION.findall(folded)), cased
+
+class TranslationMemory:
+    def __init__(self, path: str = ":memory:", threshold: float = 0.95,
+                 max_candidates: int = 20, max_cached: int = 4096):
+        # Exact matches are served from an in-RAM LRU in front of the sqlite hash index;
+        # near-duplicates go through the casefolded trigram index when similarity >= threshold
+        # and their numbers, negations and capitalized words are the same ("in 3 days" never
+        # serves "in 5 days", "polish" never serves "Polish")
+        self.path = path
+        self.threshold = threshold
+        self.max_candidates = max_candidates
+        self.max_cached = max_cached
+        self.exact_hits = 0
+        self.fuzzy_hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._cached = OrderedDict()  # hash -> target
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS segments (
+                id INTEGER PRIMARY KEY, hash TEXT UNIQUE, source TEXT, target TEXT, grams INTEGER);
+            CREATE TABLE IF NOT EXISTS trigrams (gram TEXT, segment INTEGER);
+            CREATE INDEX IF NOT EXISTS trigrams_gram ON trigrams (gram);
+        """)
+        self._db.commit()
+
+    @staticmethod
+    def make_key(text: str) -> str:
+        return hashlib.sha1(normalize(text).encode("utf-8")).hexdigest()
+
+    def lookup(self, text: str, peek: bool = False) -> Optional[Tuple[str, float]]:
+        #Return (translation, similarity) for text, or None; similarity is 1.0 for exact matches
+        # peek=True only checks: no hit / miss is counted and the LRU is unchanged
+        key = self.make_key(text)
+        with self._lock:
+            target = self._cached.get(key)
+            if target is None:
+                row = self._db.execute("SELECT target FROM segments WHERE hash = ?", (key,)).fetchone()
+                if row is not None:
+                    target = row[0]
+                    if not peek:
+                        self._cache(key, target)
+            elif not peek:
+                self._cached.move_to_end(key)
+            if target is not None:
+                self.exact_hits += not peek
+                return target, 1.0
+
+            match = self._fuzzy(text) if self.threshold < 1.0 else None
+            if peek:
+                return match
+            if match is None:
+                self.misses += 1
+            else:
+                self.fuzzy_hits += 1
+            return match
+
+    def _fuzzy(self, text: str) -> Optional[Tuple[str, float]]:
+        grams = trigrams(text)
+        if not grams:
+            return None
+        placeholders = ",".join("?" * len(grams))
+        # Candidates share the most trigrams; Dice similarity then picks the best one
+        tokens = key_tokens(text)
+        rows = self._db.execute(
+            f"SELECT s.source, s.target, s.grams, c.shared FROM "
+            f"(SELECT segment, COUNT(*) AS shared FROM trigrams WHERE gram IN ({placeholders}) "
+            f" GROUP BY segment ORDER BY shared DESC LIMIT ?) AS c "
+            f"JOIN segments AS s ON s.id = c.segment",
+            (*grams, self.max_candidates),
+        ).fetchall()
+        best = None
+        for source, target, count, shared in rows:
+            similarity = 2 * shared / (len(grams) + count)
+            if similarity < self.threshold or key_tokens(source) != tokens:
+                continue
+            if best is None or similarity > best[1]:
+                best = (target, similarity)
+        return best
+
+    def add(self, source: str, target: str):
+        #Store a translation (replacing any earlier one for the same normalized source)
+        if not source.strip() or not target.strip():
+            return
+        key = self.make_key(source)
+        grams = trigrams(source)
+        with self._lock:
+            if self._cached.get(key) == target:
+                return
+            row = self._db.execute("SELECT id, target FROM segments WHERE hash = ?", (key,)).fetchone()
+            if row is not None:
+                if row[1] != target:
+                    self._db.execute("UPDATE segments SET target = ? WHERE id = ?", (target, row[0]))
+            else:
+                segment = self._db.execute(
+                    "INSERT INTO segments (hash, source, target, grams) VALUES (?, ?, ?, ?)",
+                    (key, source, target, len(grams)),
+                ).lastrowid
+                self._db.executemany("INSERT INTO trigrams (gram, segment) VALUES (?, ?)",
+                                     ((gram, segment) for gram in grams))
+            self._db.commit()
+            self._cache(key, target)
+
+    def _cache(self, key: str, target: str):
+        self._cached[key] = target
+        self._cached.move_to_end(key)
+        while len(self._cached) > self.max_cached:
+            self._cached.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._cached.clear()
+            self.exact_hits = self.fuzzy_hits = self.misses = 0
+            self._db.execute("DELETE FROM segments")
+            self._db.execute("DELETE FROM trigrams")
+            self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = self._db.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+            return {"exact_hits": self.exact_hits, "fuzzy_hits": self.fuzzy_hits,
+                    "misses": self.misses, "segments": size}
+
+_shared = None
+_shared_lock = threading.Lock()
+
+def shared_memory() -> TranslationMemory:
+    #Process-wide memory, opened on first use from TRANSLATION_MEMORY_PATH / _THRESHOLD
+    global _shared
+    if _shared is None:
+        with _shared_lock:
+            if _shared is None:
+                _shared = TranslationMemory(
+                    path=os.getenv("TRANSLATION_MEMORY_PATH", "translation_memory.sqlite"),
+                    threshold=float(os.getenv("TRANSLATION_MEMORY_THRESHOLD", "0.95")),
+                )
+    return _shared
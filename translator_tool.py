@@ -1,34 +1,69 @@
 #Translator Tool - English to German translation using Google Gemini LLM
 
-import os
-import google.generativeai as genai
+import re
+import json
+from llm import generate_text, cached_text, remember
+from model_registry import get_model
+from instrumentation import timed
+from translation_memory import TranslationMemory, shared_memory
 
 class TranslatorTool:
-    def __init__(self):
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            raise ValueError("Missing GEMINI_API_KEY environment variable")
-        
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel("gemini-2.0-flash-exp")
+    def __init__(self, memory: TranslationMemory = None):
+        # Borrow the shared translator model instead of configuring our own
+        self.model = get_model("translator")
+        # Repeated segments are answered from the local translation memory
+        self.memory = memory if memory is not None else shared_memory()
 
-    def translate(self, text: str) -> dict:
-        if not text or not text.strip():
-            return {"success": False, "error": "Empty text provided", "original": text}
-        
-        try:
-            prompt = f"""Translate the following English text to German. 
+    def build_prompt(self, text: str) -> str:
+        return f"""Translate the following English text to German. 
             Provide only the German translation, nothing else.
             
             English: {text}
             German:"""
+
+    def clean_translation(self, german_text: str) -> str:
+        # Clean up the response - remove any extra formatting
+        if german_text.startswith("German:"):
+            german_text = german_text[7:].strip()
+        return german_text
+
+    def from_memory(self, text: str):
+        #Translation memory result for text (exact or near-duplicate), or None
+        match = self.memory.lookup(text)
+        if match is None:
+            return None
+        return {
+            "success": True,
+            "original": text,
+            "translation": match[0],
+            "language_pair": "en-de",
+            "memory_match": round(match[1], 3),
+        }
+
+    def remember(self, text: str, german_text: str):
+        #Write a model translation back to the memory (never fails the caller)
+        try:
+            self.memory.add(text, german_text)
+        except Exception:
+            pass
+
+    @timed("tool.translator")
+    def translate(self, text: str, use_memory: bool = True) -> dict:
+        # use_memory=False for callers that already checked from_memory(text)
+        if not text or not text.strip():
+            return {"success": False, "error": "Empty text provided", "original": text}
+        
+        try:
+            result = self.from_memory(text) if use_memory else None
+            if result is not None:
+                return result
+
+            prompt = self.build_prompt(text)
+            german_text = generate_text(self.model, prompt)
             
-            response = self.model.generate_content(prompt)
-            german_text = response.text.strip()
-            
-            # Clean up the response - remove any extra formatting
-            if german_text.startswith("German:"):
-                german_text = german_text[7:].strip()
+            german_text = self.clean_translation(german_text)
+            if german_text:
+                self.remember(text, german_text)
             
             return {
                 "success": True,
@@ -44,6 +79,88 @@ class TranslatorTool:
                 "original": text
             }
 
+    def translate_many(self, texts: list, max_batch_tokens: int = 2000) -> list:
+        #Translate many strings with one Gemini request per batch instead of per string
+        results = [None] * len(texts)
+        pending = {}  # unique text -> indices in the input list
+        for i, text in enumerate(texts):
+            if not text or not text.strip():
+                results[i] = {"success": False, "error": "Empty text provided", "original": text}
+            else:
+                pending.setdefault(text, []).append(i)
+
+        # Strings in the translation memory or already translated on their own skip the model
+        translations = {}
+        for text in pending:
+            match = self.memory.lookup(text)
+            if match is not None:
+                translations[text] = match[0]
+                continue
+            cached = cached_text(self.model, self.build_prompt(text))
+            if cached is not None:
+                translations[text] = self.clean_translation(cached)
+
+        uncached = [text for text in pending if text not in translations]
+        for batch in self.make_batches(uncached, max_batch_tokens):
+            try:
+                translations.update(self.translate_batch(batch))
+            except Exception:
+                # Whole batch failed - its items are retried one by one below
+                pass
+
+        for text, indices in pending.items():
+            if text in translations:
+                result = {
+                    "success": True,
+                    "original": text,
+                    "translation": translations[text],
+                    "language_pair": "en-de"
+                }
+            else:
+                # Missing, empty or misaligned in the batch answer
+                result = self.translate(text)
+            for i in indices:
+                results[i] = dict(result)
+        return results
+
+    def make_batches(self, texts: list, max_batch_tokens: int) -> list:
+        #Group texts so each batch prompt stays under a rough token estimate
+        batches, batch, batch_tokens = [], [], 0
+        for text in texts:
+            tokens = len(text) // 4 + 8  # ~4 chars per token plus JSON/numbering overhead
+            if batch and batch_tokens + tokens > max_batch_tokens:
+                batches.append(batch)
+                batch, batch_tokens = [], 0
+            batch.append(text)
+            batch_tokens += tokens
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def translate_batch(self, batch: list) -> dict:
+        #Translate one batch as a JSON list and map each answer back to its source
+        prompt = f"""Translate each English string in the following JSON array to German.
+            Respond with only a JSON array of {len(batch)} German strings, in the same order,
+            one translation per input string. Do not merge, split or skip items.
+
+            {json.dumps(batch, ensure_ascii=False)}"""
+
+        raw = generate_text(self.model, prompt)
+        raw = re.sub(r"^```(?:json)?\s*|\s*```$", "", raw.strip())
+        answers = json.loads(raw)
+        if not isinstance(answers, list) or len(answers) != len(batch):
+            # Misaligned - no answer can be trusted to belong to its input
+            return {}
+
+        translations = {}
+        for text, answer in zip(batch, answers):
+            if isinstance(answer, str) and answer.strip():
+                translations[text] = answer.strip()
+                # Seed the single-string cache and the translation memory
+                remember(self.model, self.build_prompt(text), translations[text])
+                self.remember(text, translations[text])
+        return translations
+
 if __name__ == "__main__":
     try:
         translator = TranslatorTool()